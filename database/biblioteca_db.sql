@@ -47,22 +47,27 @@ CREATE TABLE libros (
     id INT AUTO_INCREMENT PRIMARY KEY,
     titulo VARCHAR(200) NOT NULL,
     autor VARCHAR(150) NOT NULL,
-    isbn VARCHAR(20) UNIQUE,
+    isbn VARCHAR(20),
     categoria_id INT NOT NULL,
     año_publicacion YEAR,
     editorial VARCHAR(100),
     cantidad_disponible INT DEFAULT 1,
     cantidad_total INT DEFAULT 1,
+    sucursal_id INT NOT NULL DEFAULT 1,  -- Cada sucursal tiene su propio inventario
     fecha_ingreso TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     
     -- Relación con categorias
     FOREIGN KEY (categoria_id) REFERENCES categorias(id) ON DELETE RESTRICT ON UPDATE CASCADE,
     
+    -- Un mismo ISBN puede estar en varias sucursales
+    UNIQUE KEY uk_sucursal_isbn (sucursal_id, isbn),
+    
     -- Índices para optimización
     INDEX idx_titulo (titulo),
     INDEX idx_autor (autor),
     INDEX idx_isbn (isbn),
-    INDEX idx_categoria (categoria_id)
+    INDEX idx_categoria (categoria_id),
+    INDEX idx_libro_sucursal (sucursal_id, titulo)
 );
 
 -- =====================================================
@@ -78,6 +83,7 @@ CREATE TABLE prestamos (
     fecha_devolucion DATE NULL,
     observaciones TEXT,
     estado ENUM('activo', 'devuelto', 'vencido') DEFAULT 'activo',
+    sucursal_id INT NOT NULL DEFAULT 1,  -- Sucursal del ejemplar prestado
     
     -- Relaciones
     FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE RESTRICT ON UPDATE CASCADE,
@@ -87,7 +93,83 @@ CREATE TABLE prestamos (
     INDEX idx_usuario (usuario_id),
     INDEX idx_libro (libro_id),
     INDEX idx_fecha_prestamo (fecha_prestamo),
-    INDEX idx_estado (estado)
+    INDEX idx_estado (estado),
+    INDEX idx_prestamo_sucursal (sucursal_id, fecha_prestamo)
+);
+
+-- =====================================================
+-- TABLA: reservas
+-- Descripción: Cola de espera (FIFO por libro) para libros agotados
+-- =====================================================
+CREATE TABLE reservas (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    usuario_id INT NOT NULL,
+    libro_id INT NOT NULL,
+    fecha_reserva TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    estado ENUM('pendiente', 'asignada', 'cancelada') DEFAULT 'pendiente',
+    prestamo_id INT NULL,
+    fecha_asignacion TIMESTAMP NULL,
+    
+    -- Relaciones
+    FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE ON UPDATE CASCADE,
+    FOREIGN KEY (libro_id) REFERENCES libros(id) ON DELETE CASCADE ON UPDATE CASCADE,
+    FOREIGN KEY (prestamo_id) REFERENCES prestamos(id) ON DELETE SET NULL,
+    
+    -- Índices: la cabeza de la cola de un libro es la primera entrada de idx_reserva_cola
+    INDEX idx_reserva_cola (libro_id, estado, id),
+    INDEX idx_reserva_usuario (usuario_id, estado)
+);
+
+-- =====================================================
+-- TABLA: notificaciones
+-- Descripción: Avisos pendientes para los usuarios (reservas asignadas)
+-- =====================================================
+CREATE TABLE notificaciones (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    usuario_id INT NOT NULL,
+    mensaje TEXT NOT NULL,  -- Incluye el título completo del libro (hasta 200 caracteres)
+    leida BOOLEAN DEFAULT FALSE,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    
+    FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE ON UPDATE CASCADE,
+    INDEX idx_notificacion_usuario (usuario_id, leida)
+);
+
+-- =====================================================
+-- TABLA: eventos_auditoria
+-- Descripción: Quién creó, modificó o eliminó cada registro
+-- Escrita en lotes por auditoria.py; sin claves foráneas para
+-- conservar el historial de registros eliminados
+-- =====================================================
+CREATE TABLE eventos_auditoria (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    fecha DATETIME(3) NOT NULL,
+    usuario_id INT NULL,
+    accion VARCHAR(20) NOT NULL,
+    entidad VARCHAR(30) NOT NULL,
+    entidad_id INT NULL,
+    cambios JSON NULL,
+    
+    -- Índices
+    INDEX idx_auditoria_entidad (entidad, entidad_id),
+    INDEX idx_auditoria_usuario (usuario_id),
+    INDEX idx_auditoria_fecha (fecha)
+);
+
+-- =====================================================
+-- TABLA: libros_recomendados
+-- Descripción: Libros prestados por los mismos usuarios (top-K por libro)
+-- Generada por recomendaciones.py; no se edita desde la aplicación
+-- =====================================================
+CREATE TABLE libros_recomendados (
+    libro_id INT NOT NULL,
+    posicion TINYINT UNSIGNED NOT NULL,
+    recomendado_id INT NOT NULL,
+    coincidencias INT UNSIGNED NOT NULL,
+    
+    PRIMARY KEY (libro_id, posicion),
+    FOREIGN KEY (libro_id) REFERENCES libros(id) ON DELETE CASCADE ON UPDATE CASCADE,
+    FOREIGN KEY (recomendado_id) REFERENCES libros(id) ON DELETE CASCADE ON UPDATE CASCADE
 );
 
 -- =====================================================
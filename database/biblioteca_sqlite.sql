@@ -0,0 +1,293 @@
+-- =====================================================
+-- SCRIPT DE CREACIÓN DE BASE DE DATOS (SQLite)
+-- Sistema de Gestión de Biblioteca
+-- Versión para SQLite de biblioteca_db.sql (sucursales pequeñas y pruebas)
+-- =====================================================
+-- Diferencias con la versión MySQL:
+--   * ENUM se sustituye por TEXT con CHECK
+--   * Los triggers BEFORE no pueden modificar NEW: tr_libro_cantidad_total
+--     se implementa como AFTER INSERT
+--   * SIGNAL se sustituye por RAISE(ABORT, ...)
+--   * No hay procedimientos almacenados (sp_historial_usuario y
+--     sp_verificar_disponibilidad solo existen en MySQL)
+-- =====================================================
+
+PRAGMA foreign_keys = ON;
+
+-- =====================================================
+-- TABLA: usuarios
+-- =====================================================
+CREATE TABLE usuarios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre VARCHAR(100) NOT NULL,
+    email VARCHAR(100) UNIQUE NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    telefono VARCHAR(20),
+    direccion TEXT,
+    rol TEXT DEFAULT 'usuario' CHECK (rol IN ('admin', 'bibliotecario', 'usuario')),
+    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    activo BOOLEAN DEFAULT 1
+);
+CREATE INDEX idx_email ON usuarios(email);
+CREATE INDEX idx_rol ON usuarios(rol);
+
+-- =====================================================
+-- TABLA: categorias
+-- =====================================================
+CREATE TABLE categorias (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre VARCHAR(50) UNIQUE NOT NULL,
+    descripcion TEXT,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX idx_nombre ON categorias(nombre);
+
+-- =====================================================
+-- TABLA: libros
+-- =====================================================
+CREATE TABLE libros (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    titulo VARCHAR(200) NOT NULL,
+    autor VARCHAR(150) NOT NULL,
+    isbn VARCHAR(20),
+    categoria_id INTEGER NOT NULL,
+    año_publicacion INTEGER,
+    editorial VARCHAR(100),
+    cantidad_disponible INTEGER DEFAULT 1,
+    cantidad_total INTEGER DEFAULT 1,
+    sucursal_id INTEGER NOT NULL DEFAULT 1,
+    fecha_ingreso TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    FOREIGN KEY (categoria_id) REFERENCES categorias(id) ON DELETE RESTRICT ON UPDATE CASCADE,
+    UNIQUE (sucursal_id, isbn)
+);
+CREATE INDEX idx_titulo ON libros(titulo);
+CREATE INDEX idx_autor ON libros(autor);
+CREATE INDEX idx_isbn ON libros(isbn);
+CREATE INDEX idx_categoria ON libros(categoria_id);
+CREATE INDEX idx_libro_sucursal ON libros(sucursal_id, titulo);
+
+-- =====================================================
+-- TABLA: prestamos
+-- =====================================================
+CREATE TABLE prestamos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario_id INTEGER NOT NULL,
+    libro_id INTEGER NOT NULL,
+    fecha_prestamo DATE NOT NULL,
+    fecha_vencimiento DATE GENERATED ALWAYS AS (date(fecha_prestamo, '+15 days')) STORED,
+    fecha_devolucion DATE NULL,
+    observaciones TEXT,
+    estado TEXT DEFAULT 'activo' CHECK (estado IN ('activo', 'devuelto', 'vencido')),
+    sucursal_id INTEGER NOT NULL DEFAULT 1,
+
+    FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE RESTRICT ON UPDATE CASCADE,
+    FOREIGN KEY (libro_id) REFERENCES libros(id) ON DELETE RESTRICT ON UPDATE CASCADE
+);
+CREATE INDEX idx_usuario ON prestamos(usuario_id);
+CREATE INDEX idx_libro ON prestamos(libro_id);
+CREATE INDEX idx_fecha_prestamo ON prestamos(fecha_prestamo);
+CREATE INDEX idx_estado ON prestamos(estado);
+CREATE INDEX idx_prestamo_sucursal ON prestamos(sucursal_id, fecha_prestamo);
+
+-- =====================================================
+-- TABLA: reservas (cola FIFO por libro)
+-- =====================================================
+CREATE TABLE reservas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario_id INTEGER NOT NULL,
+    libro_id INTEGER NOT NULL,
+    fecha_reserva TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    estado TEXT DEFAULT 'pendiente' CHECK (estado IN ('pendiente', 'asignada', 'cancelada')),
+    prestamo_id INTEGER NULL,
+    fecha_asignacion TIMESTAMP NULL,
+
+    FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE ON UPDATE CASCADE,
+    FOREIGN KEY (libro_id) REFERENCES libros(id) ON DELETE CASCADE ON UPDATE CASCADE,
+    FOREIGN KEY (prestamo_id) REFERENCES prestamos(id) ON DELETE SET NULL
+);
+CREATE INDEX idx_reserva_cola ON reservas(libro_id, estado, id);
+CREATE INDEX idx_reserva_usuario ON reservas(usuario_id, estado);
+
+-- =====================================================
+-- TABLA: notificaciones
+-- =====================================================
+CREATE TABLE notificaciones (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario_id INTEGER NOT NULL,
+    mensaje TEXT NOT NULL,
+    leida INTEGER DEFAULT 0 CHECK (leida IN (0, 1)),
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE ON UPDATE CASCADE
+);
+CREATE INDEX idx_notificacion_usuario ON notificaciones(usuario_id, leida);
+
+-- =====================================================
+-- TABLA: eventos_auditoria (escrita en lotes por auditoria.py)
+-- =====================================================
+CREATE TABLE eventos_auditoria (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fecha TIMESTAMP NOT NULL,
+    usuario_id INTEGER NULL,
+    accion TEXT NOT NULL,
+    entidad TEXT NOT NULL,
+    entidad_id INTEGER NULL,
+    cambios TEXT NULL
+);
+CREATE INDEX idx_auditoria_entidad ON eventos_auditoria(entidad, entidad_id);
+CREATE INDEX idx_auditoria_usuario ON eventos_auditoria(usuario_id);
+CREATE INDEX idx_auditoria_fecha ON eventos_auditoria(fecha);
+
+-- =====================================================
+-- TABLA: libros_recomendados (generada por recomendaciones.py)
+-- =====================================================
+CREATE TABLE libros_recomendados (
+    libro_id INTEGER NOT NULL,
+    posicion INTEGER NOT NULL,
+    recomendado_id INTEGER NOT NULL,
+    coincidencias INTEGER NOT NULL,
+
+    PRIMARY KEY (libro_id, posicion),
+    FOREIGN KEY (libro_id) REFERENCES libros(id) ON DELETE CASCADE ON UPDATE CASCADE,
+    FOREIGN KEY (recomendado_id) REFERENCES libros(id) ON DELETE CASCADE ON UPDATE CASCADE
+) WITHOUT ROWID;
+
+-- =====================================================
+-- TRIGGER: Actualizar cantidad total al insertar libro
+-- =====================================================
+CREATE TRIGGER tr_libro_cantidad_total
+AFTER INSERT ON libros
+FOR EACH ROW
+BEGIN
+    UPDATE libros SET cantidad_total = NEW.cantidad_disponible WHERE id = NEW.id;
+END;
+
+-- =====================================================
+-- TRIGGER: Validar cantidad disponible
+-- =====================================================
+CREATE TRIGGER tr_validar_cantidad
+BEFORE UPDATE ON libros
+FOR EACH ROW
+BEGIN
+    SELECT RAISE(ABORT, 'La cantidad disponible no puede ser mayor que la cantidad total')
+    WHERE NEW.cantidad_disponible > NEW.cantidad_total;
+
+    SELECT RAISE(ABORT, 'La cantidad disponible no puede ser negativa')
+    WHERE NEW.cantidad_disponible < 0;
+END;
+
+-- =====================================================
+-- INSERTAR DATOS DE PRUEBA
+-- =====================================================
+
+INSERT INTO usuarios (nombre, email, password, telefono, direccion, rol) VALUES
+('Administrador Principal', 'admin@biblioteca.com', 'pbkdf2:sha256:600000$ZKrKvQJWLWFLrY0L$8f89c52e5b8c4f9c67bda8d4a3e2e91b12e5f8c9d6a7b3e4f5a2b1c8d9e6f3a7', '555-0001', 'Calle Principal 123', 'admin'),
+('María González', 'maria.bibliotecaria@biblioteca.com', 'pbkdf2:sha256:600000$bK8sF3mNqW9L$7e98b41d4a7c3f8b56c9e8d3f2a1e90a01d4e7f8c5b6a9d2e3f4c7a8b5e6f9', '555-0002', 'Avenida Libros 456', 'bibliotecario'),
+('Juan Pérez', 'juan.perez@email.com', 'pbkdf2:sha256:600000$mL5aR2hJ8K$6d87a30c3b6e2f7a45b8d7c2e1f89d90c3b6e9f7a4c8b5e2f6a9c3d7e8f1b4', '555-0003', 'Barrio Norte 789', 'usuario'),
+('Ana López', 'ana.lopez@email.com', 'pbkdf2:sha256:600000$nK9fT7gQ3M$5c76f29b2a5d1e6f34a7c6b1f98e8c89b2a5e8d6f3a7c4b9e5f2a8d1c6e7f9', '555-0004', 'Zona Centro 321', 'usuario'),
+('Carlos Ruiz', 'carlos.ruiz@email.com', 'pbkdf2:sha256:600000$pJ4eS6dR2N$4b65e18a1f4c9d5e23f6b5a9e87d7b78a1f4d7c5e2f6a3b8d4e9f7a2c5d8e6', '555-0005', 'Colonia Sur 654', 'usuario');
+
+INSERT INTO categorias (nombre, descripcion) VALUES
+('Ficción', 'Novelas y cuentos de ficción literaria'),
+('Ciencia y Tecnología', 'Libros sobre ciencias exactas, tecnología e informática'),
+('Historia', 'Libros de historia mundial y nacional'),
+('Biografías', 'Historias de vida de personajes importantes'),
+('Educación', 'Libros educativos y de texto'),
+('Arte y Cultura', 'Libros sobre arte, música y expresiones culturales'),
+('Filosofía', 'Textos filosóficos clásicos y contemporáneos'),
+('Ciencias Sociales', 'Sociología, psicología y ciencias humanas'),
+('Literatura Clásica', 'Obras clásicas de la literatura universal'),
+('Autoayuda', 'Libros de desarrollo personal y autoayuda');
+
+INSERT INTO libros (titulo, autor, isbn, categoria_id, año_publicacion, editorial, cantidad_disponible, cantidad_total) VALUES
+('Cien años de soledad', 'Gabriel García Márquez', '978-84-376-0494-7', 1, 1967, 'Editorial Sudamericana', 3, 3),
+('1984', 'George Orwell', '978-84-9759-564-6', 1, 1949, 'Seix Barral', 2, 2),
+('El amor en los tiempos del cólera', 'Gabriel García Márquez', '978-84-8306-652-4', 1, 1985, 'Oveja Negra', 2, 2),
+('Fahrenheit 451', 'Ray Bradbury', '978-84-9759-329-1', 1, 1953, 'Minotauro', 1, 1),
+('Introducción a los Algoritmos', 'Thomas H. Cormen', '978-84-283-3804-5', 2, 2009, 'McGraw Hill', 2, 2),
+('El gen egoísta', 'Richard Dawkins', '978-84-344-8407-4', 2, 1976, 'Oxford University Press', 1, 1),
+('Breve historia del tiempo', 'Stephen Hawking', '978-84-344-1356-9', 2, 1988, 'Bantam Books', 2, 2),
+('Sapiens: De animales a dioses', 'Yuval Noah Harari', '978-84-9992-786-1', 3, 2011, 'Debate', 3, 3),
+('El siglo de las luces', 'Alejo Carpentier', '978-84-376-0123-6', 3, 1962, 'Barral Editores', 1, 1),
+('Historia de España', 'Pierre Vilar', '978-84-8432-355-2', 3, 1947, 'Editorial Crítica', 1, 1),
+('Steve Jobs', 'Walter Isaacson', '978-84-9992-158-6', 4, 2011, 'Simon & Schuster', 2, 2),
+('Leonardo da Vinci', 'Walter Isaacson', '978-84-9992-789-2', 4, 2017, 'Simon & Schuster', 1, 1),
+('Pedagogía del oprimido', 'Paulo Freire', '978-84-323-0458-7', 5, 1970, 'Siglo XXI', 2, 2),
+('Como aprende el cerebro', 'Sarah-Jayne Blakemore', '978-84-344-5389-6', 5, 2005, 'Ariel', 1, 1),
+('Don Quijote de la Mancha', 'Miguel de Cervantes', '978-84-376-2188-3', 9, 1605, 'Espasa Calpe', 4, 4),
+('Hamlet', 'William Shakespeare', '978-84-344-8765-5', 9, 1603, 'Alianza Editorial', 2, 2),
+('La Odisea', 'Homero', '978-84-344-6754-1', 9, -800, 'Gredos', 2, 2);
+
+INSERT INTO prestamos (usuario_id, libro_id, fecha_prestamo, observaciones, estado) VALUES
+(3, 1, '2025-09-20', 'Préstamo regular', 'activo'),
+(4, 3, '2025-09-25', 'Renovación solicitada', 'activo'),
+(5, 7, '2025-10-01', 'Primera lectura del autor', 'activo'),
+(3, 2, '2025-09-01', 'Excelente estado', 'devuelto'),
+(4, 5, '2025-08-15', 'Libro muy solicitado', 'devuelto'),
+(5, 11, '2025-08-20', 'Lectura recomendada', 'devuelto');
+
+UPDATE prestamos SET fecha_devolucion = '2025-09-15' WHERE id = 4;
+UPDATE prestamos SET fecha_devolucion = '2025-08-29' WHERE id = 5;
+UPDATE prestamos SET fecha_devolucion = '2025-09-03' WHERE id = 6;
+
+-- =====================================================
+-- VISTAS ÚTILES PARA REPORTES
+-- =====================================================
+
+CREATE VIEW vista_prestamos_activos AS
+SELECT
+    p.id,
+    u.nombre as usuario_nombre,
+    u.email as usuario_email,
+    l.titulo as libro_titulo,
+    l.autor as libro_autor,
+    p.fecha_prestamo,
+    p.fecha_vencimiento,
+    CAST(julianday(p.fecha_vencimiento) - julianday('now', 'localtime', 'start of day') AS INTEGER) as dias_restantes,
+    CASE
+        WHEN date('now', 'localtime') > p.fecha_vencimiento THEN 'Vencido'
+        WHEN julianday(p.fecha_vencimiento) - julianday('now', 'localtime', 'start of day') <= 3 THEN 'Por vencer'
+        ELSE 'Vigente'
+    END as estado_prestamo
+FROM prestamos p
+JOIN usuarios u ON p.usuario_id = u.id
+JOIN libros l ON p.libro_id = l.id
+WHERE p.fecha_devolucion IS NULL;
+
+CREATE VIEW vista_libros_populares AS
+SELECT
+    l.id,
+    l.titulo,
+    l.autor,
+    c.nombre as categoria,
+    COUNT(p.id) as total_prestamos,
+    l.cantidad_total,
+    l.cantidad_disponible
+FROM libros l
+LEFT JOIN prestamos p ON l.id = p.libro_id
+JOIN categorias c ON l.categoria_id = c.id
+GROUP BY l.id, l.titulo, l.autor, c.nombre, l.cantidad_total, l.cantidad_disponible
+ORDER BY total_prestamos DESC;
+
+CREATE VIEW vista_estadisticas_categoria AS
+SELECT
+    c.id,
+    c.nombre as categoria,
+    COUNT(l.id) as total_libros,
+    SUM(l.cantidad_total) as ejemplares_totales,
+    SUM(l.cantidad_disponible) as ejemplares_disponibles,
+    COUNT(p.id) as total_prestamos
+FROM categorias c
+LEFT JOIN libros l ON c.id = l.categoria_id
+LEFT JOIN prestamos p ON l.id = p.libro_id
+GROUP BY c.id, c.nombre
+ORDER BY c.nombre;
+
+-- =====================================================
+-- ÍNDICES ADICIONALES PARA OPTIMIZACIÓN
+-- =====================================================
+
+CREATE INDEX idx_libro_categoria_autor ON libros(categoria_id, autor);
+CREATE INDEX idx_prestamo_usuario_fecha ON prestamos(usuario_id, fecha_prestamo);
+CREATE INDEX idx_prestamo_estado_fecha ON prestamos(estado, fecha_prestamo);
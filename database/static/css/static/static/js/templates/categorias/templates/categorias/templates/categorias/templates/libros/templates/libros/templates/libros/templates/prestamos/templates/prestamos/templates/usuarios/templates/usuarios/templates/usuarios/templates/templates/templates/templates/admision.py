@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Control de admisión y limitación de tasa para el Sistema de Gestión de Biblioteca
+
+Cuando MySQL se ralentiza, cada hilo queda bloqueado en una consulta y las
+peticiones se acumulan hasta que todo el sitio deja de responder. Este
+módulo limita cuántas peticiones de cada ruta pueden estar a la vez dentro
+de la base de datos, con una cola de espera acotada:
+
+* Rutas no críticas (listados, dashboard): esperan poco y, si no hay hueco,
+  responden enseguida `503` con `Retry-After`.
+* Rutas críticas (préstamo y devolución): tienen su propio cupo, que los
+  listados no pueden consumir, y toleran una espera mayor.
+
+Además, `limitar_tasa` aplica un token bucket por cliente (IP) a `/login`.
+"""
+
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import wraps
+from types import GeneratorType
+
+from flask import Response, make_response, request
+
+# Límites por defecto
+ESPERA_NO_CRITICA = 0.5  # segundos
+ESPERA_CRITICA = 5.0  # segundos
+RETRY_AFTER = 5  # segundos sugeridos al cliente
+MAX_CLIENTES_RASTREADOS = 10000
+
+_rechazos_por_ruta = defaultdict(int)
+_metricas_lock = threading.Lock()
+
+
+def _rechazar(ruta, estado, mensaje, reintentar_en):
+    """Respuesta de rechazo con Retry-After, contabilizada por ruta"""
+    with _metricas_lock:
+        _rechazos_por_ruta[ruta] += 1
+    response = make_response(mensaje, estado)
+    response.headers['Retry-After'] = str(max(1, int(reintentar_en + 0.999)))
+    return response
+
+
+class Compuerta:
+    """Límite de concurrencia con cola de espera acotada"""
+
+    def __init__(self, max_concurrentes, max_en_cola, espera):
+        self.max_concurrentes = max_concurrentes
+        self.max_en_cola = max_en_cola
+        self.espera = espera
+        self._semaforo = threading.BoundedSemaphore(max_concurrentes)
+        self._lock = threading.Lock()
+        self._en_cola = 0
+        self._activas = 0
+
+    def entrar(self):
+        """Intentar entrar; False si la cola está llena o vence la espera"""
+        if self._semaforo.acquire(blocking=False):
+            self._marcar_activa(1)
+            return True
+
+        with self._lock:
+            if self._en_cola >= self.max_en_cola:
+                return False
+            self._en_cola += 1
+        try:
+            admitida = self._semaforo.acquire(timeout=self.espera)
+        finally:
+            with self._lock:
+                self._en_cola -= 1
+
+        if admitida:
+            self._marcar_activa(1)
+        return admitida
+
+    def salir(self):
+        self._marcar_activa(-1)
+        self._semaforo.release()
+
+    def _marcar_activa(self, delta):
+        with self._lock:
+            self._activas += delta
+
+    def estado(self):
+        with self._lock:
+            return {
+                'activas': self._activas,
+                'en_cola': self._en_cola,
+                'max_concurrentes': self.max_concurrentes,
+                'max_en_cola': self.max_en_cola
+            }
+
+
+_compuertas = {}
+
+
+def admision(max_concurrentes, max_en_cola=None, critica=False):
+    """
+    Decorador de control de admisión para una ruta.
+
+    Las rutas críticas esperan hasta ESPERA_CRITICA segundos; las demás
+    hasta ESPERA_NO_CRITICA antes de responder 503.
+    """
+    if max_en_cola is None:
+        max_en_cola = max_concurrentes * 2
+    espera = ESPERA_CRITICA if critica else ESPERA_NO_CRITICA
+
+    def decorador(f):
+        compuerta = Compuerta(max_concurrentes, max_en_cola, espera)
+        _compuertas[f.__name__] = compuerta
+
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not compuerta.entrar():
+                return _rechazar(f.__name__, 503,
+                                 'El sistema está saturado. Intenta de nuevo en unos segundos.',
+                                 RETRY_AFTER)
+            try:
+                resultado = f(*args, **kwargs)
+            except BaseException:
+                compuerta.salir()
+                raise
+
+            # Las respuestas en streaming siguen usando la BD mientras se envían.
+            # El servidor cierra la respuesta también si no llega a recorrerla
+            # (HEAD, 304, cliente desconectado), así que la compuerta se
+            # libera al cerrarla y no en el `finally` de un generador.
+            if isinstance(resultado, GeneratorType):
+                resultado = make_response(resultado)
+            if isinstance(resultado, Response) and resultado.is_streamed:
+                resultado.call_on_close(compuerta.salir)
+                return resultado
+            compuerta.salir()
+            return resultado
+        return decorated_function
+    return decorador
+
+
+class TokenBucket:
+    """Token bucket por cliente: `capacidad` intentos, recargando `tasa` por segundo"""
+
+    def __init__(self, capacidad, tasa):
+        self.capacidad = capacidad
+        self.tasa = tasa
+        self._clientes = OrderedDict()  # cliente -> (tokens, ultima_recarga)
+        self._lock = threading.Lock()
+
+    def consumir(self, cliente):
+        """Retorna 0 si hay token disponible, o los segundos hasta el siguiente"""
+        ahora = time.monotonic()
+        with self._lock:
+            tokens, ultima = self._clientes.pop(cliente, (self.capacidad, ahora))
+            tokens = min(self.capacidad, tokens + (ahora - ultima) * self.tasa)
+
+            if tokens >= 1:
+                tokens -= 1
+                espera = 0
+            else:
+                espera = (1 - tokens) / self.tasa
+
+            self._clientes[cliente] = (tokens, ahora)
+            # Olvidar los clientes más antiguos para acotar la memoria
+            while len(self._clientes) > MAX_CLIENTES_RASTREADOS:
+                self._clientes.popitem(last=False)
+            return espera
+
+
+def limitar_tasa(capacidad, por_minuto, metodos=('POST',)):
+    """Decorador de limitación de tasa por IP (por defecto solo para POST)"""
+    bucket = TokenBucket(capacidad, por_minuto / 60.0)
+
+    def decorador(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method in metodos:
+                espera = bucket.consumir(request.remote_addr)
+                if espera:
+                    return _rechazar(f.__name__, 429,
+                                     'Demasiados intentos. Espera antes de volver a intentarlo.',
+                                     espera)
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorador
+
+
+def obtener_metricas_admision():
+    """Estado de cada compuerta y rechazos acumulados por ruta"""
+    with _metricas_lock:
+        rechazos = dict(_rechazos_por_ruta)
+    return {
+        'compuertas': {ruta: compuerta.estado() for ruta, compuerta in _compuertas.items()},
+        'rechazos': rechazos
+    }
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Analítica de circulación para el Sistema de Gestión de Biblioteca
+
+Las vistas de `biblioteca_db.sql` no responden preguntas por periodo
+(préstamos por categoría y mes, duración media, evolución de los
+vencidos) sin GROUP BY costosos sobre la base principal. Este módulo lee
+una sola vez los préstamos del periodo, unidos a su libro, por lotes con
+`fetchmany`, los guarda en columnas de NumPy y calcula todos los
+agregados con operaciones vectorizadas (`bincount` sobre índices de mes y
+categoría).
+
+Con varias sucursales el historial se lee en paralelo de todos los nodos
+(`sucursales.dispersar`) y se concatena antes de agregar. Si algún nodo no
+responde el informe falla con `NodoNoDisponible`: un informe parcial
+parecería correcto sin serlo.
+
+La ruta `/reportes` guarda el informe renderizado en la caché de
+fragmentos, con una clave por periodo y por versión de las tablas.
+
+Requiere el paquete opcional NumPy (`pip install -r requirements-analitica.txt`).
+"""
+
+from datetime import date, datetime
+
+from db import NodoNoDisponible
+from sucursales import dispersar, en_sucursales
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NUMPY_DISPONIBLE = np is not None
+
+TAMANO_LOTE = 5000  # filas leídas por fetchmany
+MESES_POR_DEFECTO = 12
+MESES_MAXIMOS = 60
+
+CONSULTA_HISTORIAL = """
+    SELECT p.fecha_prestamo, p.fecha_devolucion, p.fecha_vencimiento, l.categoria_id
+    FROM prestamos p
+    JOIN libros l ON p.libro_id = l.id
+    WHERE p.fecha_prestamo >= %s AND p.fecha_prestamo < %s AND {filtro}
+"""
+
+# Columnas del historial y su tipo en NumPy
+COLUMNAS = (
+    ('prestamo', 'datetime64[D]'),
+    ('devolucion', 'datetime64[D]'),  # NaT si no se ha devuelto
+    ('vencimiento', 'datetime64[D]'),
+    ('categoria', 'int64'),
+)
+
+
+def _sumar_meses(mes, meses):
+    """Primer día del mes desplazado `meses` meses"""
+    indice = mes.year * 12 + mes.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def periodo(desde_txt, hasta_txt, hoy=None):
+    """
+    Convertir los meses `AAAA-MM` del formulario en el intervalo
+    [primer día de `desde`, primer día del mes siguiente a `hasta`).
+    Sin valores válidos se usan los últimos MESES_POR_DEFECTO meses.
+    """
+    hoy = hoy or date.today()
+    try:
+        hasta = datetime.strptime(hasta_txt, '%Y-%m').date()
+    except (TypeError, ValueError):
+        hasta = hoy.replace(day=1)
+    try:
+        desde = datetime.strptime(desde_txt, '%Y-%m').date()
+    except (TypeError, ValueError):
+        desde = _sumar_meses(hasta, 1 - MESES_POR_DEFECTO)
+
+    if desde > hasta:
+        desde, hasta = hasta, desde
+    desde = max(desde, _sumar_meses(hasta, 1 - MESES_MAXIMOS))
+    return desde, _sumar_meses(hasta, 1)
+
+
+def leer_historial(conn, desde, hasta, nodo, tamano_lote=TAMANO_LOTE):
+    """Leer por lotes los préstamos del periodo en las sucursales del nodo como columnas de NumPy"""
+    partes = {nombre: [] for nombre, _ in COLUMNAS}
+    consulta, params = en_sucursales(CONSULTA_HISTORIAL, 'p.sucursal_id', nodo)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(consulta, (desde, hasta) + params)
+        while True:
+            filas = cursor.fetchmany(tamano_lote)
+            if not filas:
+                break
+            for (nombre, tipo), valores in zip(COLUMNAS, zip(*filas)):
+                partes[nombre].append(np.array(valores, dtype=tipo))
+    finally:
+        cursor.close()
+
+    return {
+        nombre: np.concatenate(partes[nombre]) if partes[nombre] else np.empty(0, dtype=tipo)
+        for nombre, tipo in COLUMNAS
+    }
+
+
+def unir_historiales(historiales):
+    """Concatenar las columnas de los historiales de varios nodos"""
+    return {
+        nombre: np.concatenate([historial[nombre] for historial in historiales])
+        if historiales else np.empty(0, dtype=tipo)
+        for nombre, tipo in COLUMNAS
+    }
+
+
+def _dividir(numerador, denominador):
+    """División elemento a elemento que deja None donde el denominador es 0"""
+    return [round(float(n) / d, 4) if d else None for n, d in zip(numerador, denominador)]
+
+
+def calcular_informe(historial, nombres_categorias, desde, hasta, hoy=None):
+    """
+    Agregados mensuales del periodo [desde, hasta):
+
+    * préstamos por categoría y mes
+    * duración media (días) de los préstamos devueltos
+    * proporción de préstamos vencidos: devueltos después del vencimiento
+      o todavía pendientes con el vencimiento ya pasado
+    """
+    hoy = np.datetime64(hoy or date.today(), 'D')
+    meses = np.arange(np.datetime64(desde, 'M'), np.datetime64(hasta, 'M'))
+    n_meses = len(meses)
+
+    prestamo = historial['prestamo']
+    devolucion = historial['devolucion']
+    indice_mes = (prestamo.astype('datetime64[M]') - meses[0]).astype(np.int64)
+
+    # Préstamos por mes y categoría en una sola pasada
+    categorias, indice_categoria = np.unique(historial['categoria'], return_inverse=True)
+    n_categorias = len(categorias)
+    por_categoria = np.bincount(
+        indice_mes * n_categorias + indice_categoria,
+        minlength=n_meses * n_categorias
+    ).reshape(n_meses, n_categorias)
+    totales = por_categoria.sum(axis=1)
+
+    devuelto = ~np.isnat(devolucion)
+    duracion = (devolucion[devuelto] - prestamo[devuelto]).astype(np.int64)
+    devueltos = np.bincount(indice_mes[devuelto], minlength=n_meses)
+    dias = np.bincount(indice_mes[devuelto], weights=duracion, minlength=n_meses)
+
+    vencido = np.where(devuelto, devolucion > historial['vencimiento'],
+                       historial['vencimiento'] < hoy)
+    vencidos = np.bincount(indice_mes, weights=vencido, minlength=n_meses)
+
+    duracion_media = _dividir(dias, devueltos)
+    tasa_vencidos = _dividir(vencidos, totales)
+    return {
+        'categorias': [nombres_categorias.get(int(c), f'#{c}') for c in categorias],
+        'meses': [
+            {
+                'mes': str(mes),
+                'total': int(totales[i]),
+                'por_categoria': por_categoria[i].tolist(),
+                'duracion_media': duracion_media[i],
+                'tasa_vencidos': tasa_vencidos[i]
+            }
+            for i, mes in enumerate(meses)
+        ],
+        'resumen': {
+            'total': int(totales.sum()),
+            'por_categoria': por_categoria.sum(axis=0).tolist(),
+            'duracion_media': round(float(duracion.mean()), 1) if len(duracion) else None,
+            'tasa_vencidos': round(float(vencido.mean()), 4) if len(vencido) else None
+        }
+    }
+
+
+def informe_circulacion(conn, desde, hasta, hoy=None):
+    """
+    Leer el historial del periodo de todos los nodos y calcular sus
+    agregados. `conn` es la conexión al nodo principal (categorías).
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, nombre FROM categorias")
+    nombres_categorias = dict(cursor.fetchall())
+    cursor.close()
+
+    historiales, fallidos = dispersar(
+        lambda conn_nodo, nodo: leer_historial(conn_nodo, desde, hasta, nodo)
+    )
+    if fallidos:
+        raise NodoNoDisponible(f"Sin respuesta de: {', '.join(fallidos)}")
+    historial = unir_historiales(historiales)
+    return calcular_informe(historial, nombres_categorias, desde, hasta, hoy)
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API REST JSON asíncrona para el Sistema de Gestión de Biblioteca
+
+Servicio independiente de app.py construido sobre Quart (API equivalente a
+Flask sobre asyncio) y aiomysql, con un pool de conexiones compartido. Una
+consulta bloqueada ya no retiene un hilo de trabajo: mientras espera a
+MySQL el bucle de eventos atiende otras peticiones.
+
+Endpoints (versión 1, solo lectura):
+    GET /api/v1/<recurso>             listado con paginación por cursor
+    GET /api/v1/<recurso>/<id>        detalle de un registro
+
+Recursos: usuarios, categorias, libros, prestamos.
+
+Parámetros del listado:
+    limite   número de registros (por defecto 50, máximo 500)
+    despues  cursor devuelto en `siguiente` por la página anterior
+    campos   lista separada por comas de columnas a devolver
+
+Con varias sucursales (`SUCURSALES_CONFIG`, ver `sucursales.py`) hay un
+pool por nodo. Libros y préstamos se leen del nodo que indica el bloque de
+su id, y el cursor de paginación recorre los nodos en orden de bloque;
+usuarios y categorías se leen del nodo principal.
+
+La sesión es la misma que la de app.py (misma clave secreta), por lo que
+hay que iniciar sesión en la aplicación web antes de usar la API. Quart y
+Flask 2.3 no pueden convivir en el mismo entorno (versiones de blinker
+incompatibles), así que la API se instala en su propio entorno virtual.
+
+Ejecución:
+    python -m venv venv-api && source venv-api/bin/activate
+    pip install -r requirements-api.txt
+    hypercorn api:app --bind 127.0.0.1:5001
+"""
+
+import json
+import os
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import wraps
+
+import aiomysql
+from quart import Quart, jsonify, request, session
+
+app = Quart(__name__)
+# Debe coincidir con app.secret_key de app.py para compartir la sesión
+app.secret_key = os.environ.get('SECRET_KEY') or 'tu_clave_secreta_aqui'
+
+# Mismas variables de entorno que config.py, con los valores de app.py por defecto
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST') or 'localhost',
+    'port': int(os.environ.get('DB_PORT', 3306)),
+    'user': os.environ.get('DB_USER') or 'root',
+    'password': os.environ.get('DB_PASSWORD') or '',
+    'database': os.environ.get('DB_NAME') or 'biblioteca_db'
+}
+
+# Mismo mapa de nodos que sucursales.py (solo se necesitan los parámetros de conexión)
+RUTA_SUCURSALES = os.environ.get('SUCURSALES_CONFIG')
+RANGO_IDS = 100_000_000
+RECURSOS_POR_SUCURSAL = ('libros', 'prestamos')
+
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 500
+TAMANO_POOL = 20
+
+# Columnas públicas de cada tabla (ver database/biblioteca_db.sql).
+# La contraseña de usuarios nunca se expone.
+RECURSOS = {
+    'usuarios': ('id', 'nombre', 'email', 'telefono', 'direccion', 'rol',
+                 'fecha_registro', 'activo'),
+    'categorias': ('id', 'nombre', 'descripcion', 'fecha_creacion'),
+    'libros': ('id', 'titulo', 'autor', 'isbn', 'categoria_id', 'año_publicacion',
+               'editorial', 'cantidad_disponible', 'cantidad_total', 'fecha_ingreso', 'sucursal_id'),
+    'prestamos': ('id', 'usuario_id', 'libro_id', 'fecha_prestamo', 'fecha_vencimiento',
+                  'fecha_devolucion', 'observaciones', 'estado', 'sucursal_id'),
+}
+
+pools = {}  # bloque -> pool del nodo; el bloque 0 es el principal
+
+
+def cargar_nodos(ruta=RUTA_SUCURSALES):
+    """Parámetros de conexión de cada nodo por bloque (solo el principal sin mapa)"""
+    if not ruta:
+        return {0: dict(DB_CONFIG)}
+    with open(ruta, encoding='utf-8') as f:
+        nodos = json.load(f)['nodos']
+    configuracion = {}
+    for parametros in nodos.values():
+        parametros = dict(parametros)
+        bloque = int(parametros.pop('bloque'))
+        configuracion[bloque] = dict(DB_CONFIG, **parametros)
+    return configuracion
+
+
+@app.before_serving
+async def crear_pool():
+    """Crear el pool de conexiones de cada nodo al arrancar el servidor"""
+    for bloque, config in sorted(cargar_nodos().items()):
+        pools[bloque] = await aiomysql.create_pool(
+            host=config['host'],
+            port=int(config['port']),
+            user=config['user'],
+            password=config['password'],
+            db=config['database'],
+            charset='utf8mb4',
+            autocommit=True,
+            minsize=1,
+            maxsize=TAMANO_POOL
+        )
+
+
+@app.after_serving
+async def cerrar_pool():
+    """Cerrar los pools al detener el servidor"""
+    for pool in pools.values():
+        pool.close()
+        await pool.wait_closed()
+
+
+def login_required(f):
+    """Decorador para endpoints que requieren sesión iniciada"""
+    @wraps(f)
+    async def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({'error': 'Autenticación requerida'}), 401
+        return await f(*args, **kwargs)
+    return decorated_function
+
+
+def serializar(valor):
+    """Convertir tipos de MySQL a valores JSON"""
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, timedelta):
+        return valor.total_seconds()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return valor
+
+
+def seleccionar_campos(recurso):
+    """Columnas pedidas en `campos`, validadas contra las columnas públicas"""
+    disponibles = RECURSOS[recurso]
+    pedidos = request.args.get('campos')
+    if not pedidos:
+        return list(disponibles), None
+
+    campos = [campo.strip() for campo in pedidos.split(',') if campo.strip()]
+    invalidos = [campo for campo in campos if campo not in disponibles]
+    if invalidos:
+        return None, f"Campos no válidos: {', '.join(invalidos)}"
+
+    # El id es necesario para construir el cursor de la siguiente página
+    if 'id' not in campos:
+        campos.insert(0, 'id')
+    return campos, None
+
+
+def columnas_sql(campos):
+    """Lista de columnas entre comillas invertidas"""
+    return ', '.join(f"`{campo}`" for campo in campos)
+
+
+@app.route('/api/v1/<recurso>')
+@login_required
+async def listar(recurso):
+    """Listado paginado por cursor (id ascendente)"""
+    if recurso not in RECURSOS:
+        return jsonify({'error': 'Recurso no encontrado'}), 404
+
+    campos, error = seleccionar_campos(recurso)
+    if error:
+        return jsonify({'error': error}), 400
+
+    try:
+        limite = min(int(request.args.get('limite', LIMITE_POR_DEFECTO)), LIMITE_MAXIMO)
+        despues = int(request.args.get('despues', 0))
+    except ValueError:
+        return jsonify({'error': 'limite y despues deben ser enteros'}), 400
+    if limite < 1:
+        return jsonify({'error': 'limite debe ser mayor que cero'}), 400
+
+    # Los ids de cada nodo están en su bloque: recorrer los nodos en orden
+    # desde el del cursor da el mismo orden por id que una sola base
+    if recurso in RECURSOS_POR_SUCURSAL:
+        bloques = [bloque for bloque in sorted(pools) if bloque >= despues // RANGO_IDS]
+    else:
+        bloques = [0]
+
+    filas = []
+    for bloque in bloques:
+        async with pools[bloque].acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                # Se pide un registro extra para saber si hay más páginas
+                if recurso in RECURSOS_POR_SUCURSAL:
+                    await cursor.execute(
+                        f"SELECT {columnas_sql(campos)} FROM {recurso} "
+                        f"WHERE id > %s AND id >= %s AND id < %s ORDER BY id LIMIT %s",
+                        (despues, bloque * RANGO_IDS, (bloque + 1) * RANGO_IDS, limite + 1 - len(filas))
+                    )
+                else:
+                    await cursor.execute(
+                        f"SELECT {columnas_sql(campos)} FROM {recurso} WHERE id > %s ORDER BY id LIMIT %s",
+                        (despues, limite + 1)
+                    )
+                filas.extend(await cursor.fetchall())
+        if len(filas) > limite:
+            break
+
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = str(filas[-1]['id'])
+
+    return jsonify({
+        'datos': [{campo: serializar(valor) for campo, valor in fila.items()} for fila in filas],
+        'siguiente': siguiente
+    })
+
+
+@app.route('/api/v1/<recurso>/<int:id>')
+@login_required
+async def detalle(recurso, id):
+    """Detalle de un registro por id"""
+    if recurso not in RECURSOS:
+        return jsonify({'error': 'Recurso no encontrado'}), 404
+
+    campos, error = seleccionar_campos(recurso)
+    if error:
+        return jsonify({'error': error}), 400
+
+    bloque = id // RANGO_IDS if recurso in RECURSOS_POR_SUCURSAL else 0
+    if bloque not in pools:
+        return jsonify({'error': 'Registro no encontrado'}), 404
+
+    async with pools[bloque].acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(
+                f"SELECT {columnas_sql(campos)} FROM {recurso} WHERE id = %s",
+                (id,)
+            )
+            fila = await cursor.fetchone()
+
+    if fila is None:
+        return jsonify({'error': 'Registro no encontrado'}), 404
+
+    return jsonify({campo: serializar(valor) for campo, valor in fila.items()})
+
+
+if __name__ == '__main__':
+    app.run(port=int(os.environ.get('PORT', 5001)))
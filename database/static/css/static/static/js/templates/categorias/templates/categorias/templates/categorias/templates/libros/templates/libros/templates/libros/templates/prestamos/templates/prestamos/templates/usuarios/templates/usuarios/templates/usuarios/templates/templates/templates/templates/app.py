@@ -1,12 +1,30 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, session, g, has_request_context, jsonify, make_response, stream_template, Response
+from markupsafe import Markup
 from werkzeug.security import generate_password_hash, check_password_hash
-import mysql.connector
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+import heapq
+import json
 import os
 from functools import wraps
+from db import ERRORES_BD, conectar
+from transacciones import ejecutar_transaccion, obtener_metricas_reintentos
+from versiones import condicional, incrementar_version
+from admision import admision, limitar_tasa, obtener_metricas_admision
+from cache_fragmentos import cache_fragmentos, clave_fragmento
+from estaticos import configurar_estaticos
+from perfilador import configurar_perfilador, perfilar_conexion
+from analitica import NUMPY_DISPONIBLE, informe_circulacion, periodo
+from auditoria import (configurar_auditoria, diferencias, fila_actual, iterar_eventos,
+                       obtener_metricas_auditoria, registrar_evento)
+from salud import configurar_salud, estado_listo, estado_profundo
+from sucursales import (configurar_sucursales, dispersar, eliminar_replicada, en_sucursales,
+                        listar_nodos, nodo_de_id, nodo_de_sucursal, nodo_principal,
+                        nombres_sucursales, replicar_fila, sucursal_por_defecto)
 
 app = Flask(__name__)
 app.secret_key = 'tu_clave_secreta_aqui'  # Cambiar por una clave más segura
+configurar_estaticos(app)
+configurar_perfilador(app)
 
 # Configuración de la base de datos
 DB_CONFIG = {
@@ -16,14 +34,197 @@ DB_CONFIG = {
     'database': 'biblioteca_db'
 }
 
-def get_db_connection():
-    """Crear conexión a la base de datos"""
+# A partir de este número de filas los listados se envían en streaming
+UMBRAL_STREAMING = 1000
+
+# Aviso cuando un cambio en usuarios o categorías no llega a algún nodo
+PENDIENTE_DE_COPIAR = 'Cambio guardado, pero pendiente de copiar (python sucursales.py) en:'
+
+# Consultas por nodo: `{filtro}` limita las filas a las sucursales del nodo
+CONSULTA_LIBROS = """
+    SELECT l.*, c.nombre as categoria_nombre, WEIGHT_STRING(l.titulo) as orden_titulo
+    FROM libros l 
+    JOIN categorias c ON l.categoria_id = c.id 
+    WHERE {filtro}
+    ORDER BY l.titulo
+"""
+
+CONSULTA_PRESTAMOS = """
+    SELECT p.*, u.nombre as usuario_nombre, l.titulo as libro_titulo
+    FROM prestamos p
+    JOIN usuarios u ON p.usuario_id = u.id
+    JOIN libros l ON p.libro_id = l.id
+    WHERE {filtro}
+    ORDER BY p.fecha_prestamo DESC
+"""
+
+def get_db_connection(nodo=None):
+    """Crear conexión a la base de datos (por defecto, al nodo principal)"""
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
-    except mysql.connector.Error as e:
+        connection = conectar((nodo or nodo_principal()).config)
+        return perfilar_conexion(connection)
+    except ERRORES_BD as e:
         print(f"Error conectando a la base de datos: {e}")
+        if has_request_context():
+            g.db_error = True
+        return None
+
+configurar_sucursales(DB_CONFIG, get_db_connection)
+configurar_auditoria(get_db_connection)
+configurar_salud(get_db_connection)
+
+def conexion_por_id(id):
+    """Conexión al nodo que guarda el libro, préstamo o reserva `id`"""
+    nodo = nodo_de_id(id)
+    if nodo is None:
+        flash('Registro no encontrado', 'error')
+        return None
+    return get_db_connection(nodo)
+
+def leer_filas(consulta, columna):
+    """
+    Consulta para `dispersar`: filas (diccionarios) de la consulta con
+    `{filtro}` limitado por `columna` a las sucursales de cada nodo.
+    """
+    def leer(conn, nodo):
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(*en_sucursales(consulta, columna, nodo))
+        filas = cursor.fetchall()
+        cursor.close()
+        return filas
+    return leer
+
+def nodos_filtrados():
+    """Nodos a consultar: todos, o solo el de la sucursal elegida con `?sucursal=`"""
+    sucursal_id = request.args.get('sucursal', type=int)
+    nodo = nodo_de_sucursal(sucursal_id)
+    return [nodo._replace(sucursales=(sucursal_id,))] if nodo else None
+
+def por_titulo(fila):
+    """
+    Clave para intercalar con `heapq.merge` filas ordenadas por título en
+    cada nodo. MySQL ordena con la colación de la columna (utf8mb4_unicode_ci,
+    sin distinguir mayúsculas ni acentos), que no coincide con la comparación
+    de cadenas de Python: se compara su peso de ordenación (`orden_titulo`,
+    de WEIGHT_STRING) y el resultado sigue el mismo orden que cada nodo.
+    """
+    return fila['orden_titulo']
+
+def avisar_nodos_caidos(fallidos, mensaje='Datos incompletos, sin respuesta de:'):
+    """Avisar en la página de los nodos que no respondieron"""
+    if fallidos:
+        flash(f"{mensaje} {', '.join(fallidos)}", 'error')
+
+def recoger_notificaciones(conn, usuario_id):
+    """Leer los avisos pendientes del usuario en un nodo y marcarlos como leídos"""
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(
+        "SELECT id, mensaje FROM notificaciones WHERE usuario_id = %s AND leida = 0 ORDER BY id",
+        (usuario_id,)
+    )
+    notificaciones = cursor.fetchall()
+    if notificaciones:
+        cursor.execute(
+            "UPDATE notificaciones SET leida = 1 WHERE usuario_id = %s AND id <= %s",
+            (usuario_id, notificaciones[-1]['id'])
+        )
+        conn.commit()
+    cursor.close()
+    return notificaciones
+
+def asignar_reserva(tx, libro_id, titulo, sucursal_id):
+    """
+    Prestar un ejemplar del libro a la cabeza de su cola de reservas, dentro
+    de la transacción `tx` que ya bloquea la fila del libro. Retorna el
+    nombre del usuario, o None si nadie espera. No toca cantidad_disponible.
+    """
+    # Cabeza de la cola de reservas del libro (primera entrada de idx_reserva_cola)
+    tx.execute(
+        "SELECT id, usuario_id FROM reservas WHERE libro_id = %s AND estado = 'pendiente' "
+        "ORDER BY id LIMIT 1 FOR UPDATE",
+        (libro_id,)
+    )
+    reserva = tx.fetchall()
+    if not reserva:
         return None
+    
+    # El ejemplar pasa directamente a quien lleva más tiempo esperando
+    reserva_id, usuario_id = reserva[0]
+    ahora = datetime.now()
+    tx.execute(
+        "INSERT INTO prestamos (usuario_id, libro_id, fecha_prestamo, sucursal_id) VALUES (%s, %s, %s, %s)",
+        (usuario_id, libro_id, ahora.date(), sucursal_id)
+    )
+    tx.execute(
+        "UPDATE reservas SET estado = 'asignada', prestamo_id = %s, fecha_asignacion = %s WHERE id = %s",
+        (tx.lastrowid, ahora, reserva_id)
+    )
+    tx.execute(
+        "INSERT INTO notificaciones (usuario_id, mensaje) VALUES (%s, %s)",
+        (usuario_id, f'Tu reserva de "{titulo}" está lista: el libro ya está prestado a tu nombre')
+    )
+    tx.execute("SELECT nombre FROM usuarios WHERE id = %s", (usuario_id,))
+    return tx.fetchall()[0][0]
+
+@app.context_processor
+def datos_sucursales():
+    """Nombres de las sucursales para formularios y tablas"""
+    return {'sucursales': nombres_sucursales()}
+
+def iterar_filas(conn, consulta, params=(), tamano_lote=500):
+    """
+    Generador de filas con cursor sin buffer, para respuestas en streaming.
+    Mantiene en memoria como máximo `tamano_lote` filas. La conexión la
+    cierra quien la abrió (ver `abrir_listados`).
+    """
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(consulta, params)
+        while True:
+            filas = cursor.fetchmany(tamano_lote)
+            if not filas:
+                break
+            yield from filas
+    finally:
+        try:
+            cursor.close()
+        except ERRORES_BD:
+            # Lectura interrumpida: quedan filas sin leer en el servidor
+            pass
+
+def generar_plantilla(nombre, **contexto):
+    """Trozos de la plantilla `nombre` a medida que se renderiza, para incluirla en streaming"""
+    app.update_template_context(contexto)
+    return app.jinja_env.get_template(nombre).generate(contexto)
+
+def abrir_listados(nodos, consulta, columna):
+    """
+    Abrir en cada nodo un cursor sin buffer de `consulta` (con `{filtro}`
+    limitado por `columna`), para listados en streaming.
+
+    Retorna los generadores de filas, una función que los cierra junto con
+    sus conexiones y `{nombre: error}` de los nodos sin conexión, como
+    `dispersar`. La función hay que registrarla con `response.call_on_close`:
+    un generador que no llega a empezar (HEAD, cliente que corta antes del
+    primer trozo) nunca ejecuta su `finally`. Cerrar dos veces no tiene efecto.
+    """
+    listados = []
+    conexiones = []
+    fallidos = {}
+    for nodo in nodos:
+        conn = get_db_connection(nodo)
+        if conn:
+            conexiones.append(conn)
+            listados.append(iterar_filas(conn, *en_sucursales(consulta, columna, nodo)))
+        else:
+            fallidos[nodo.nombre] = 'sin conexión'
+    
+    def cerrar():
+        for listado in listados:
+            listado.close()
+        for conn in conexiones:
+            conn.close()
+    return listados, cerrar, fallidos
 
 def login_required(f):
     """Decorador para rutas que requieren autenticación"""
@@ -42,6 +243,7 @@ def index():
     return render_template('index.html')
 
 @app.route('/login', methods=['GET', 'POST'])
+@limitar_tasa(capacidad=5, por_minuto=6)
 def login():
     """Login de usuarios"""
     if request.method == 'POST':
@@ -59,6 +261,12 @@ def login():
                 session['user_name'] = user['nombre']
                 session['user_role'] = user['rol']
                 flash('¡Bienvenido!', 'success')
+                
+                # Avisos pendientes (p. ej. reservas asignadas) en el nodo de cada sucursal
+                avisos, _ = dispersar(lambda conn_nodo, nodo: recoger_notificaciones(conn_nodo, user['id']))
+                for notificaciones in avisos:
+                    for notificacion in notificaciones:
+                        flash(notificacion['mensaje'], 'info')
                 return redirect(url_for('dashboard'))
             else:
                 flash('Email o contraseña incorrectos', 'error')
@@ -77,6 +285,7 @@ def logout():
 
 @app.route('/dashboard')
 @login_required
+@admision(max_concurrentes=4)
 def dashboard():
     """Panel principal después del login"""
     conn = get_db_connection()
@@ -86,27 +295,68 @@ def dashboard():
         cursor = conn.cursor()
         
         # Estadísticas básicas
-        cursor.execute("SELECT COUNT(*) FROM libros")
-        stats['total_libros'] = cursor.fetchone()[0]
-        
         cursor.execute("SELECT COUNT(*) FROM usuarios WHERE rol = 'usuario'")
         stats['total_usuarios'] = cursor.fetchone()[0]
         
-        cursor.execute("SELECT COUNT(*) FROM prestamos WHERE fecha_devolucion IS NULL")
-        stats['prestamos_activos'] = cursor.fetchone()[0]
-        
         cursor.execute("SELECT COUNT(*) FROM categorias")
         stats['total_categorias'] = cursor.fetchone()[0]
         
         cursor.close()
         conn.close()
+        
+        # Libros y préstamos activos: suma de los nodos de todas las sucursales
+        totales, fallidos = dispersar(leer_filas("""
+            SELECT (SELECT COUNT(*) FROM libros WHERE {filtro}) as libros,
+                   (SELECT COUNT(*) FROM prestamos WHERE fecha_devolucion IS NULL AND {filtro}) as activos
+        """, 'sucursal_id'))
+        stats['total_libros'] = sum(filas[0]['libros'] for filas in totales)
+        stats['prestamos_activos'] = sum(filas[0]['activos'] for filas in totales)
+        avisar_nodos_caidos(fallidos)
     
     return render_template('dashboard.html', stats=stats)
 
+@app.route('/metricas')
+@login_required
+def metricas():
+    """Métricas internas de rendimiento (solo administradores)"""
+    if session.get('user_role') != 'admin':
+        return jsonify({'error': 'Acceso restringido a administradores'}), 403
+    
+    return jsonify({
+        'transacciones': obtener_metricas_reintentos(),
+        'cache_fragmentos': cache_fragmentos.estadisticas(),
+        'admision': obtener_metricas_admision(),
+        'auditoria': obtener_metricas_auditoria()
+    })
+
+# ========== SALUD ==========
+
+@app.route('/healthz')
+def healthz():
+    """El proceso está vivo (no consulta la base de datos)"""
+    return jsonify({'estado': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """
+    La aplicación puede atender peticiones: conexión y SELECT 1 cacheados.
+    El detalle de `?profundo=1` (nodos y filas) es solo para administradores.
+    """
+    profundo = request.args.get('profundo') == '1'
+    if profundo and session.get('user_role') != 'admin':
+        return jsonify({'error': 'Acceso restringido a administradores'}), 403
+    
+    resultado = estado_listo()
+    if profundo:
+        resultado['profundo'] = estado_profundo()
+    return jsonify(resultado), 200 if resultado['listo'] else 503
+
 # ========== CRUD USUARIOS ==========
 
 @app.route('/usuarios')
 @login_required
+@condicional('usuarios')
+@admision(max_concurrentes=4)
 def usuarios():
     """Listar todos los usuarios"""
     conn = get_db_connection()
@@ -144,9 +394,15 @@ def crear_usuario():
                     (nombre, email, hashed_password, telefono, direccion, rol)
                 )
                 conn.commit()
+                usuario_id = cursor.lastrowid
+                incrementar_version('usuarios')
+                registrar_evento('crear', 'usuarios', usuario_id, {
+                    'nombre': nombre, 'email': email, 'telefono': telefono, 'direccion': direccion, 'rol': rol
+                })
+                avisar_nodos_caidos(replicar_fila(conn, 'usuarios', usuario_id), PENDIENTE_DE_COPIAR)
                 flash('Usuario creado exitosamente', 'success')
                 return redirect(url_for('usuarios'))
-            except mysql.connector.Error as e:
+            except ERRORES_BD as e:
                 flash(f'Error al crear usuario: {e}', 'error')
             finally:
                 cursor.close()
@@ -170,14 +426,20 @@ def editar_usuario(id):
         if conn:
             cursor = conn.cursor()
             try:
+                anterior = fila_actual(conn, 'usuarios', id)
                 cursor.execute(
                     "UPDATE usuarios SET nombre=%s, email=%s, telefono=%s, direccion=%s, rol=%s WHERE id=%s",
                     (nombre, email, telefono, direccion, rol, id)
                 )
                 conn.commit()
+                incrementar_version('usuarios')
+                registrar_evento('editar', 'usuarios', id, diferencias(anterior, {
+                    'nombre': nombre, 'email': email, 'telefono': telefono, 'direccion': direccion, 'rol': rol
+                }))
+                avisar_nodos_caidos(replicar_fila(conn, 'usuarios', id), PENDIENTE_DE_COPIAR)
                 flash('Usuario actualizado exitosamente', 'success')
                 return redirect(url_for('usuarios'))
-            except mysql.connector.Error as e:
+            except ERRORES_BD as e:
                 flash(f'Error al actualizar usuario: {e}', 'error')
             finally:
                 cursor.close()
@@ -197,19 +459,14 @@ def editar_usuario(id):
 @app.route('/usuarios/<int:id>/eliminar', methods=['POST'])
 @login_required
 def eliminar_usuario(id):
-    """Eliminar usuario"""
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
-        try:
-            cursor.execute("DELETE FROM usuarios WHERE id = %s", (id,))
-            conn.commit()
-            flash('Usuario eliminado exitosamente', 'success')
-        except mysql.connector.Error as e:
-            flash(f'Error al eliminar usuario: {e}', 'error')
-        finally:
-            cursor.close()
-            conn.close()
+    """Eliminar usuario (en todos los nodos)"""
+    try:
+        eliminar_replicada('usuarios', id)
+        incrementar_version('usuarios')
+        registrar_evento('eliminar', 'usuarios', id)
+        flash('Usuario eliminado exitosamente', 'success')
+    except ERRORES_BD as e:
+        flash(f'Error al eliminar usuario: {e}', 'error')
     
     return redirect(url_for('usuarios'))
 
@@ -217,6 +474,8 @@ def eliminar_usuario(id):
 
 @app.route('/categorias')
 @login_required
+@condicional('categorias')
+@admision(max_concurrentes=4)
 def categorias():
     """Listar todas las categorías"""
     conn = get_db_connection()
@@ -248,9 +507,13 @@ def crear_categoria():
                     (nombre, descripcion)
                 )
                 conn.commit()
+                categoria_id = cursor.lastrowid
+                incrementar_version('categorias')
+                registrar_evento('crear', 'categorias', categoria_id, {'nombre': nombre, 'descripcion': descripcion})
+                avisar_nodos_caidos(replicar_fila(conn, 'categorias', categoria_id), PENDIENTE_DE_COPIAR)
                 flash('Categoría creada exitosamente', 'success')
                 return redirect(url_for('categorias'))
-            except mysql.connector.Error as e:
+            except ERRORES_BD as e:
                 flash(f'Error al crear categoría: {e}', 'error')
             finally:
                 cursor.close()
@@ -271,14 +534,18 @@ def editar_categoria(id):
         if conn:
             cursor = conn.cursor()
             try:
+                anterior = fila_actual(conn, 'categorias', id)
                 cursor.execute(
                     "UPDATE categorias SET nombre=%s, descripcion=%s WHERE id=%s",
                     (nombre, descripcion, id)
                 )
                 conn.commit()
+                incrementar_version('categorias')
+                registrar_evento('editar', 'categorias', id, diferencias(anterior, {'nombre': nombre, 'descripcion': descripcion}))
+                avisar_nodos_caidos(replicar_fila(conn, 'categorias', id), PENDIENTE_DE_COPIAR)
                 flash('Categoría actualizada exitosamente', 'success')
                 return redirect(url_for('categorias'))
-            except mysql.connector.Error as e:
+            except ERRORES_BD as e:
                 flash(f'Error al actualizar categoría: {e}', 'error')
             finally:
                 cursor.close()
@@ -298,19 +565,14 @@ def editar_categoria(id):
 @app.route('/categorias/<int:id>/eliminar', methods=['POST'])
 @login_required
 def eliminar_categoria(id):
-    """Eliminar categoría"""
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
-        try:
-            cursor.execute("DELETE FROM categorias WHERE id = %s", (id,))
-            conn.commit()
-            flash('Categoría eliminada exitosamente', 'success')
-        except mysql.connector.Error as e:
-            flash(f'Error al eliminar categoría: {e}', 'error')
-        finally:
-            cursor.close()
-            conn.close()
+    """Eliminar categoría (en todos los nodos)"""
+    try:
+        eliminar_replicada('categorias', id)
+        incrementar_version('categorias')
+        registrar_evento('eliminar', 'categorias', id)
+        flash('Categoría eliminada exitosamente', 'success')
+    except ERRORES_BD as e:
+        flash(f'Error al eliminar categoría: {e}', 'error')
     
     return redirect(url_for('categorias'))
 
@@ -318,29 +580,57 @@ def eliminar_categoria(id):
 
 @app.route('/libros')
 @login_required
+@condicional('libros', 'categorias')
+@admision(max_concurrentes=4)
 def libros():
-    """Listar todos los libros"""
-    conn = get_db_connection()
-    libros = []
+    """Listar los libros de todas las sucursales (o de la elegida con `?sucursal=`)"""
+    clave = clave_fragmento('libros', ('libros', 'categorias'))
+    tabla_html = cache_fragmentos.obtener(clave)
+    if tabla_html is not None:
+        return render_template('libros/index.html', tabla_html=Markup(tabla_html))
     
-    if conn:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT l.*, c.nombre as categoria_nombre 
-            FROM libros l 
-            JOIN categorias c ON l.categoria_id = c.id 
-            ORDER BY l.titulo
-        """)
-        libros = cursor.fetchall()
-        cursor.close()
-        conn.close()
+    # Resumen de cada nodo en paralelo
+    nodos = nodos_filtrados()
+    conteos, fallidos = dispersar(leer_filas("""
+        SELECT COUNT(*) as total,
+               SUM(cantidad_disponible > 0) as disponibles,
+               SUM(cantidad_disponible > 0 AND cantidad_disponible <= 1) as pocos,
+               SUM(cantidad_disponible = 0) as agotados
+        FROM libros
+        WHERE {filtro}
+    """, 'sucursal_id'), nodos)
+    avisar_nodos_caidos(fallidos)
+    resumen = {
+        campo: sum(int(filas[0][campo] or 0) for filas in conteos)
+        for campo in ('total', 'disponibles', 'pocos', 'agotados')
+    }
+    respondieron = [nodo for nodo in (nodos or listar_nodos()) if nodo.nombre not in fallidos]
+    
+    # Catálogos grandes: enviar las filas a medida que se leen, intercalando los nodos por título.
+    # La tabla se guarda en la caché si el envío termina completo.
+    if resumen['total'] > UMBRAL_STREAMING:
+        listados, cerrar, fallidos_listado = abrir_listados(respondieron, CONSULTA_LIBROS, 'l.sucursal_id')
+        avisar_nodos_caidos(fallidos_listado)
+        libros = heapq.merge(*listados, key=por_titulo)
+        tabla = generar_plantilla('libros/_tabla.html', libros=libros, resumen=resumen)
+        if not fallidos and not fallidos_listado:
+            tabla = cache_fragmentos.guardar_al_terminar(clave, tabla)
+        response = make_response(stream_template('libros/index.html', tabla_en_streaming=tabla))
+        response.call_on_close(cerrar)
+        return response
+    
+    listados, fallidos_listado = dispersar(leer_filas(CONSULTA_LIBROS, 'l.sucursal_id'), respondieron)
+    libros = list(heapq.merge(*listados, key=por_titulo))
     
-    return render_template('libros/index.html', libros=libros)
+    tabla_html = render_template('libros/_tabla.html', libros=libros, resumen=resumen)
+    if not fallidos and not fallidos_listado:
+        cache_fragmentos.guardar(clave, tabla_html)
+    return render_template('libros/index.html', tabla_html=Markup(tabla_html))
 
 @app.route('/libros/crear', methods=['GET', 'POST'])
 @login_required
 def crear_libro():
-    """Crear nuevo libro"""
+    """Crear nuevo libro en el inventario de una sucursal"""
     conn = get_db_connection()
     categorias = []
     
@@ -348,6 +638,8 @@ def crear_libro():
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT * FROM categorias ORDER BY nombre")
         categorias = cursor.fetchall()
+        cursor.close()
+        conn.close()
         
         if request.method == 'POST':
             titulo = request.form['titulo']
@@ -357,30 +649,45 @@ def crear_libro():
             año_publicacion = request.form['año_publicacion']
             editorial = request.form['editorial']
             cantidad_disponible = request.form['cantidad_disponible']
+            sucursal_id = request.form.get('sucursal_id', type=int) or sucursal_por_defecto()
             
-            try:
-                cursor.execute(
-                    "INSERT INTO libros (titulo, autor, isbn, categoria_id, año_publicacion, editorial, cantidad_disponible) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-                    (titulo, autor, isbn, categoria_id, año_publicacion, editorial, cantidad_disponible)
-                )
-                conn.commit()
-                flash('Libro creado exitosamente', 'success')
-                return redirect(url_for('libros'))
-            except mysql.connector.Error as e:
-                flash(f'Error al crear libro: {e}', 'error')
-        
-        cursor.close()
-        conn.close()
+            # El libro se guarda en el nodo de su sucursal
+            nodo = nodo_de_sucursal(sucursal_id)
+            conn = get_db_connection(nodo) if nodo else None
+            if nodo is None:
+                flash('Sucursal desconocida', 'error')
+            elif conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(
+                        "INSERT INTO libros (titulo, autor, isbn, categoria_id, año_publicacion, editorial, cantidad_disponible, sucursal_id) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                        (titulo, autor, isbn, categoria_id, año_publicacion, editorial, cantidad_disponible, sucursal_id)
+                    )
+                    conn.commit()
+                    incrementar_version('libros')
+                    registrar_evento('crear', 'libros', cursor.lastrowid, {
+                        'titulo': titulo, 'autor': autor, 'isbn': isbn, 'categoria_id': categoria_id,
+                        'año_publicacion': año_publicacion, 'editorial': editorial,
+                        'cantidad_disponible': cantidad_disponible, 'sucursal_id': sucursal_id
+                    })
+                    flash('Libro creado exitosamente', 'success')
+                    return redirect(url_for('libros'))
+                except ERRORES_BD as e:
+                    flash(f'Error al crear libro: {e}', 'error')
+                finally:
+                    cursor.close()
+                    conn.close()
     
     return render_template('libros/crear.html', categorias=categorias)
 
 @app.route('/libros/<int:id>/editar', methods=['GET', 'POST'])
 @login_required
 def editar_libro(id):
-    """Editar libro existente"""
-    conn = get_db_connection()
+    """Editar libro existente (en el nodo de su sucursal)"""
+    conn = conexion_por_id(id)
     libro = None
     categorias = []
+    recomendados = []
     
     if conn:
         cursor = conn.cursor(dictionary=True)
@@ -394,40 +701,97 @@ def editar_libro(id):
             categoria_id = request.form['categoria_id']
             año_publicacion = request.form['año_publicacion']
             editorial = request.form['editorial']
-            cantidad_disponible = request.form['cantidad_disponible']
+            cantidad_disponible = request.form.get('cantidad_disponible', type=int)
             
-            try:
-                cursor.execute(
+            def actualizar_libro(tx):
+                # Mismo orden de bloqueo que préstamos y devoluciones: la fila del libro primero
+                tx.execute("SELECT sucursal_id FROM libros WHERE id = %s FOR UPDATE", (id,))
+                libro = tx.fetchall()
+                if not libro:
+                    return None
+                tx.execute(
                     "UPDATE libros SET titulo=%s, autor=%s, isbn=%s, categoria_id=%s, año_publicacion=%s, editorial=%s, cantidad_disponible=%s WHERE id=%s",
                     (titulo, autor, isbn, categoria_id, año_publicacion, editorial, cantidad_disponible, id)
                 )
-                conn.commit()
-                flash('Libro actualizado exitosamente', 'success')
-                return redirect(url_for('libros'))
-            except mysql.connector.Error as e:
-                flash(f'Error al actualizar libro: {e}', 'error')
+                
+                # Los ejemplares disponibles van primero a quienes esperan en la cola, como al devolver
+                asignados = []
+                while len(asignados) < cantidad_disponible:
+                    asignado = asignar_reserva(tx, id, titulo, libro[0][0])
+                    if asignado is None:
+                        break
+                    asignados.append(asignado)
+                if asignados:
+                    tx.execute(
+                        "UPDATE libros SET cantidad_disponible = %s WHERE id = %s",
+                        (cantidad_disponible - len(asignados), id)
+                    )
+                return asignados
+            
+            if cantidad_disponible is None or cantidad_disponible < 0:
+                flash('La cantidad disponible debe ser un número entero no negativo', 'error')
+            else:
+                try:
+                    anterior = fila_actual(conn, 'libros', id)
+                    asignados = ejecutar_transaccion(conn, actualizar_libro, 'editar_libro')
+                    if asignados is None:
+                        flash('Libro no encontrado', 'error')
+                        return redirect(url_for('libros'))
+                    
+                    cambios = diferencias(anterior, {
+                        'titulo': titulo, 'autor': autor, 'isbn': isbn, 'categoria_id': categoria_id,
+                        'año_publicacion': año_publicacion, 'editorial': editorial,
+                        'cantidad_disponible': cantidad_disponible - len(asignados)
+                    })
+                    if asignados:
+                        incrementar_version('libros', 'prestamos', 'reservas')
+                        registrar_evento('editar', 'libros', id, dict(cambios, asignado_a_reserva=asignados))
+                        flash(f"Libro actualizado y prestado a {', '.join(asignados)}, en espera en la cola", 'success')
+                    else:
+                        incrementar_version('libros')
+                        registrar_evento('editar', 'libros', id, cambios)
+                        flash('Libro actualizado exitosamente', 'success')
+                    return redirect(url_for('libros'))
+                except ERRORES_BD as e:
+                    flash(f'Error al actualizar libro: {e}', 'error')
         
         # GET request
         cursor.execute("SELECT * FROM libros WHERE id = %s", (id,))
         libro = cursor.fetchone()
         
+        # Vecinos precalculados por recomendaciones.py (lectura por clave primaria)
+        try:
+            cursor.execute("""
+                SELECT l.id, l.titulo, l.autor, l.cantidad_disponible, r.coincidencias
+                FROM libros_recomendados r
+                JOIN libros l ON l.id = r.recomendado_id
+                WHERE r.libro_id = %s
+                ORDER BY r.posicion
+            """, (id,))
+            recomendados = cursor.fetchall()
+        except ERRORES_BD as e:
+            app.logger.warning("Recomendaciones no disponibles para el libro %s: %s", id, e)
+        
         cursor.close()
         conn.close()
     
-    return render_template('libros/editar.html', libro=libro, categorias=categorias)
+    return render_template('libros/editar.html', libro=libro, categorias=categorias,
+                           recomendados=recomendados)
 
 @app.route('/libros/<int:id>/eliminar', methods=['POST'])
 @login_required
 def eliminar_libro(id):
-    """Eliminar libro"""
-    conn = get_db_connection()
+    """Eliminar libro (en el nodo de su sucursal)"""
+    conn = conexion_por_id(id)
     if conn:
         cursor = conn.cursor()
         try:
             cursor.execute("DELETE FROM libros WHERE id = %s", (id,))
             conn.commit()
+            incrementar_version('libros')
+            registrar_evento('eliminar', 'libros', id)
             flash('Libro eliminado exitosamente', 'success')
-        except mysql.connector.Error as e:
+        except ERRORES_BD as e:
             flash(f'Error al eliminar libro: {e}', 'error')
         finally:
             cursor.close()
@@ -439,28 +803,58 @@ def eliminar_libro(id):
 
 @app.route('/prestamos')
 @login_required
+@admision(max_concurrentes=4)
 def prestamos():
     """Listar todos los préstamos"""
-    conn = get_db_connection()
-    prestamos = []
+    # El estado (vencido, por vencer) depende de la fecha actual
+    hoy = date.today()
+    clave = clave_fragmento('prestamos', ('prestamos', 'usuarios', 'libros'), hoy)
+    tabla_html = cache_fragmentos.obtener(clave)
+    if tabla_html is not None:
+        return render_template('prestamos/index.html', tabla_html=Markup(tabla_html))
     
-    if conn:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT p.*, u.nombre as usuario_nombre, l.titulo as libro_titulo
-            FROM prestamos p
-            JOIN usuarios u ON p.usuario_id = u.id
-            JOIN libros l ON p.libro_id = l.id
-            ORDER BY p.fecha_prestamo DESC
-        """)
-        prestamos = cursor.fetchall()
-        cursor.close()
-        conn.close()
+    # Resumen de cada nodo en paralelo
+    conteos, fallidos = dispersar(leer_filas(
+        "SELECT COUNT(*) as total, SUM(fecha_devolucion IS NULL) as activos FROM prestamos WHERE {filtro}",
+        'sucursal_id'
+    ))
+    avisar_nodos_caidos(fallidos)
+    total = sum(filas[0]['total'] for filas in conteos)
+    activos = sum(int(filas[0]['activos'] or 0) for filas in conteos)
+    resumen = {
+        'total': total,
+        'activos': activos,
+        'devueltos': total - activos
+    }
+    respondieron = [nodo for nodo in listar_nodos() if nodo.nombre not in fallidos]
+    
+    def mas_reciente(prestamo):
+        return prestamo['fecha_prestamo']
+    
+    # Historiales grandes: enviar las filas a medida que se leen, intercalando los nodos por fecha.
+    # La tabla se guarda en la caché si el envío termina completo.
+    if total > UMBRAL_STREAMING:
+        listados, cerrar, fallidos_listado = abrir_listados(respondieron, CONSULTA_PRESTAMOS, 'p.sucursal_id')
+        avisar_nodos_caidos(fallidos_listado)
+        prestamos = heapq.merge(*listados, key=mas_reciente, reverse=True)
+        tabla = generar_plantilla('prestamos/_tabla.html', prestamos=prestamos, resumen=resumen, hoy=hoy)
+        if not fallidos and not fallidos_listado:
+            tabla = cache_fragmentos.guardar_al_terminar(clave, tabla)
+        response = make_response(stream_template('prestamos/index.html', tabla_en_streaming=tabla))
+        response.call_on_close(cerrar)
+        return response
+    
+    listados, fallidos_listado = dispersar(leer_filas(CONSULTA_PRESTAMOS, 'p.sucursal_id'), respondieron)
+    prestamos = list(heapq.merge(*listados, key=mas_reciente, reverse=True))
     
-    return render_template('prestamos/index.html', prestamos=prestamos)
+    tabla_html = render_template('prestamos/_tabla.html', prestamos=prestamos, resumen=resumen, hoy=hoy)
+    if not fallidos and not fallidos_listado:
+        cache_fragmentos.guardar(clave, tabla_html)
+    return render_template('prestamos/index.html', tabla_html=Markup(tabla_html))
 
 @app.route('/prestamos/crear', methods=['GET', 'POST'])
 @login_required
+@admision(max_concurrentes=8, critica=True)
 def crear_prestamo():
     """Crear nuevo préstamo"""
     conn = get_db_connection()
@@ -471,79 +865,328 @@ def crear_prestamo():
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT * FROM usuarios WHERE rol = 'usuario' ORDER BY nombre")
         usuarios = cursor.fetchall()
+        cursor.close()
+        conn.close()
         
-        cursor.execute("SELECT * FROM libros WHERE cantidad_disponible > 0 ORDER BY titulo")
-        libros = cursor.fetchall()
+        # Libros con ejemplares en cualquier sucursal
+        listados, fallidos = dispersar(leer_filas(
+            "SELECT *, WEIGHT_STRING(titulo) as orden_titulo FROM libros "
+            "WHERE cantidad_disponible > 0 AND {filtro} ORDER BY titulo", 'sucursal_id'
+        ))
+        libros = list(heapq.merge(*listados, key=por_titulo))
+        avisar_nodos_caidos(fallidos)
         
         if request.method == 'POST':
             usuario_id = request.form['usuario_id']
             libro_id = request.form['libro_id']
             fecha_prestamo = datetime.now().date()
             
-            try:
-                # Crear préstamo
-                cursor.execute(
-                    "INSERT INTO prestamos (usuario_id, libro_id, fecha_prestamo) VALUES (%s, %s, %s)",
-                    (usuario_id, libro_id, fecha_prestamo)
+            def registrar_prestamo(tx):
+                # Orden de bloqueo: primero la fila del libro, luego reservas y prestamos
+                tx.execute("SELECT sucursal_id FROM libros WHERE id = %s FOR UPDATE", (libro_id,))
+                libro = tx.fetchall()
+                if not libro:
+                    return None
+                
+                # Con reservas en espera, el ejemplar es de la primera de la cola
+                tx.execute(
+                    "SELECT usuario_id FROM reservas WHERE libro_id = %s AND estado = 'pendiente' "
+                    "ORDER BY id LIMIT 1 FOR UPDATE",
+                    (libro_id,)
                 )
+                cabeza = tx.fetchall()
+                if cabeza and str(cabeza[0][0]) != str(usuario_id):
+                    return 'en_espera'
+                
+                # Crear préstamo en la sucursal del ejemplar
+                tx.execute(
+                    "INSERT INTO prestamos (usuario_id, libro_id, fecha_prestamo, sucursal_id) VALUES (%s, %s, %s, %s)",
+                    (usuario_id, libro_id, fecha_prestamo, libro[0][0])
+                )
+                
+                prestamo_id = tx.lastrowid
+                
+                if cabeza:
+                    tx.execute(
+                        "UPDATE reservas SET estado = 'asignada', prestamo_id = %s, fecha_asignacion = %s "
+                        "WHERE libro_id = %s AND usuario_id = %s AND estado = 'pendiente'",
+                        (prestamo_id, datetime.now(), libro_id, usuario_id)
+                    )
                 
                 # Reducir cantidad disponible del libro
-                cursor.execute(
+                tx.execute(
                     "UPDATE libros SET cantidad_disponible = cantidad_disponible - 1 WHERE id = %s",
                     (libro_id,)
                 )
-                
-                conn.commit()
-                flash('Préstamo creado exitosamente', 'success')
-                return redirect(url_for('prestamos'))
-            except mysql.connector.Error as e:
-                flash(f'Error al crear préstamo: {e}', 'error')
-        
-        cursor.close()
-        conn.close()
+                return prestamo_id
+            
+            # La transacción se ejecuta entera en el nodo del libro
+            conn = conexion_por_id(libro_id)
+            if conn:
+                try:
+                    prestamo_id = ejecutar_transaccion(conn, registrar_prestamo, 'crear_prestamo')
+                    if prestamo_id is None:
+                        flash('Libro no encontrado', 'error')
+                    elif prestamo_id == 'en_espera':
+                        flash('El libro tiene reservas en espera: el ejemplar es para la primera de la cola', 'error')
+                    else:
+                        incrementar_version('prestamos', 'libros', 'reservas')
+                        registrar_evento('crear', 'prestamos', prestamo_id, {'usuario_id': usuario_id, 'libro_id': libro_id})
+                        flash('Préstamo creado exitosamente', 'success')
+                        return redirect(url_for('prestamos'))
+                except ERRORES_BD as e:
+                    flash(f'Error al crear préstamo: {e}', 'error')
+                finally:
+                    conn.close()
     
-    return render_template('prestamos/crear.html', usuarios=usuarios, libros=libros)
+    hoy = date.today()
+    return render_template('prestamos/crear.html', usuarios=usuarios, libros=libros,
+                           hoy=hoy, vencimiento=hoy + timedelta(days=15))
 
 @app.route('/prestamos/<int:id>/devolver', methods=['POST'])
 @login_required
+@admision(max_concurrentes=8, critica=True)
 def devolver_libro(id):
-    """Marcar libro como devuelto"""
-    conn = get_db_connection()
+    """Marcar libro como devuelto (en el nodo de la sucursal del préstamo)"""
+    conn = conexion_por_id(id)
     if conn:
-        cursor = conn.cursor()
-        try:
+        def registrar_devolucion(tx):
             # Obtener información del préstamo
-            cursor.execute("SELECT libro_id FROM prestamos WHERE id = %s", (id,))
-            resultado = cursor.fetchone()
+            tx.execute("SELECT libro_id FROM prestamos WHERE id = %s", (id,))
+            resultado = tx.fetchone()
+            if not resultado:
+                return None
             
-            if resultado:
-                libro_id = resultado[0]
-                fecha_devolucion = datetime.now().date()
-                
-                # Actualizar préstamo
-                cursor.execute(
-                    "UPDATE prestamos SET fecha_devolucion = %s WHERE id = %s",
-                    (fecha_devolucion, id)
-                )
-                
+            libro_id = resultado[0]
+            fecha_devolucion = datetime.now().date()
+            
+            # Orden de bloqueo: primero la fila del libro, luego prestamos y reservas
+            tx.execute("SELECT titulo, sucursal_id FROM libros WHERE id = %s FOR UPDATE", (libro_id,))
+            titulo, sucursal_id = tx.fetchall()[0]
+            
+            # Actualizar préstamo (solo si sigue pendiente, para que el reintento sea idempotente)
+            tx.execute(
+                "UPDATE prestamos SET fecha_devolucion = %s WHERE id = %s AND fecha_devolucion IS NULL",
+                (fecha_devolucion, id)
+            )
+            if tx.rowcount == 0:
+                return False
+            
+            asignado = asignar_reserva(tx, libro_id, titulo, sucursal_id)
+            if asignado is None:
                 # Aumentar cantidad disponible del libro
-                cursor.execute(
+                tx.execute(
                     "UPDATE libros SET cantidad_disponible = cantidad_disponible + 1 WHERE id = %s",
                     (libro_id,)
                 )
-                
-                conn.commit()
+                return True
+            return asignado
+        
+        try:
+            devuelto = ejecutar_transaccion(conn, registrar_devolucion, 'devolver_libro')
+            if devuelto is None:
+                flash('Préstamo no encontrado', 'error')
+            elif devuelto is True:
+                incrementar_version('prestamos', 'libros')
+                registrar_evento('devolver', 'prestamos', id)
                 flash('Libro devuelto exitosamente', 'success')
+            elif devuelto:
+                incrementar_version('prestamos', 'libros', 'reservas')
+                registrar_evento('devolver', 'prestamos', id, {'asignado_a_reserva': devuelto})
+                flash(f'Libro devuelto y prestado a {devuelto}, primera reserva en espera', 'success')
             else:
-                flash('Préstamo no encontrado', 'error')
-                
-        except mysql.connector.Error as e:
+                flash('El préstamo ya había sido devuelto', 'error')
+        except ERRORES_BD as e:
             flash(f'Error al devolver libro: {e}', 'error')
         finally:
-            cursor.close()
             conn.close()
     
     return redirect(url_for('prestamos'))
 
+# ========== RESERVAS ==========
+
+@app.route('/reservas')
+@login_required
+@condicional('reservas', 'usuarios', 'libros')
+@admision(max_concurrentes=4)
+def reservas():
+    """Listar reservas en espera con su posición en la cola de cada libro"""
+    # Cada cola vive en el nodo de su libro: la posición se calcula en él
+    listados, fallidos = dispersar(leer_filas("""
+        SELECT r.*, u.nombre as usuario_nombre, l.titulo as libro_titulo,
+               WEIGHT_STRING(l.titulo) as orden_titulo,
+               ROW_NUMBER() OVER (PARTITION BY r.libro_id ORDER BY r.id) as posicion
+        FROM reservas r
+        JOIN usuarios u ON r.usuario_id = u.id
+        JOIN libros l ON r.libro_id = l.id
+        WHERE r.estado = 'pendiente' AND {filtro}
+        ORDER BY l.titulo, r.id
+    """, 'l.sucursal_id'))
+    avisar_nodos_caidos(fallidos)
+    reservas = list(heapq.merge(*listados, key=lambda reserva: (por_titulo(reserva), reserva['id'])))
+    
+    return render_template('reservas/index.html', reservas=reservas)
+
+@app.route('/reservas/crear', methods=['GET', 'POST'])
+@login_required
+@admision(max_concurrentes=8, critica=True)
+def crear_reserva():
+    """Poner a un usuario en la cola de espera de un libro agotado"""
+    conn = get_db_connection()
+    usuarios = []
+    libros = []
+    
+    if conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT * FROM usuarios WHERE rol = 'usuario' ORDER BY nombre")
+        usuarios = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        
+        listados, fallidos = dispersar(leer_filas(
+            "SELECT *, WEIGHT_STRING(titulo) as orden_titulo FROM libros "
+            "WHERE cantidad_disponible = 0 AND {filtro} ORDER BY titulo", 'sucursal_id'
+        ))
+        libros = list(heapq.merge(*listados, key=por_titulo))
+        avisar_nodos_caidos(fallidos)
+        
+        if request.method == 'POST':
+            usuario_id = request.form['usuario_id']
+            libro_id = request.form['libro_id']
+            
+            def registrar_reserva(tx):
+                # Mismo bloqueo que préstamos y devoluciones: la cola no cambia mientras tanto
+                tx.execute("SELECT cantidad_disponible FROM libros WHERE id = %s FOR UPDATE", (libro_id,))
+                libro = tx.fetchall()
+                if not libro:
+                    return None
+                if libro[0][0] > 0:
+                    return 'disponible'
+                
+                tx.execute(
+                    "SELECT id FROM reservas WHERE usuario_id = %s AND libro_id = %s AND estado = 'pendiente'",
+                    (usuario_id, libro_id)
+                )
+                if tx.fetchall():
+                    return 'duplicada'
+                
+                tx.execute("INSERT INTO reservas (usuario_id, libro_id) VALUES (%s, %s)", (usuario_id, libro_id))
+                reserva_id = tx.lastrowid
+                tx.execute(
+                    "SELECT COUNT(*) FROM reservas WHERE libro_id = %s AND estado = 'pendiente'",
+                    (libro_id,)
+                )
+                return reserva_id, tx.fetchall()[0][0]
+            
+            # La cola se guarda en el nodo de la sucursal del libro
+            conn = conexion_por_id(libro_id)
+            if conn:
+                try:
+                    resultado = ejecutar_transaccion(conn, registrar_reserva, 'crear_reserva')
+                    if resultado is None:
+                        flash('Libro no encontrado', 'error')
+                    elif resultado == 'disponible':
+                        flash('El libro tiene ejemplares disponibles: registra el préstamo directamente', 'error')
+                    elif resultado == 'duplicada':
+                        flash('El usuario ya está en la cola de este libro', 'error')
+                    else:
+                        reserva_id, posicion = resultado
+                        incrementar_version('reservas')
+                        registrar_evento('crear', 'reservas', reserva_id, {'usuario_id': usuario_id, 'libro_id': libro_id})
+                        flash(f'Reserva registrada. Posición en la cola: {posicion}', 'success')
+                        return redirect(url_for('reservas'))
+                except ERRORES_BD as e:
+                    flash(f'Error al crear reserva: {e}', 'error')
+                finally:
+                    conn.close()
+    
+    return render_template('reservas/crear.html', usuarios=usuarios, libros=libros)
+
+@app.route('/reservas/<int:id>/cancelar', methods=['POST'])
+@login_required
+def cancelar_reserva(id):
+    """Cancelar una reserva que sigue en espera"""
+    conn = conexion_por_id(id)
+    if conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("UPDATE reservas SET estado = 'cancelada' WHERE id = %s AND estado = 'pendiente'", (id,))
+            conn.commit()
+            if cursor.rowcount:
+                incrementar_version('reservas')
+                registrar_evento('cancelar', 'reservas', id)
+                flash('Reserva cancelada', 'success')
+            else:
+                flash('La reserva ya no está en espera', 'error')
+        except ERRORES_BD as e:
+            flash(f'Error al cancelar reserva: {e}', 'error')
+        finally:
+            cursor.close()
+            conn.close()
+    
+    return redirect(url_for('reservas'))
+
+# ========== AUDITORÍA ==========
+
+@app.route('/auditoria')
+@login_required
+def exportar_auditoria():
+    """Registro de auditoría en streaming como NDJSON (solo administradores)"""
+    if session.get('user_role') != 'admin':
+        return jsonify({'error': 'Acceso restringido a administradores'}), 403
+    
+    filtros = {
+        'entidad': request.args.get('entidad'),
+        'entidad_id': request.args.get('entidad_id', type=int),
+        'usuario_id': request.args.get('usuario_id', type=int),
+        'desde': request.args.get('desde'),
+        'hasta': request.args.get('hasta')
+    }
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Base de datos no disponible'}), 503
+    
+    def generar():
+        for evento in iterar_eventos(conn, **filtros):
+            yield json.dumps(evento, default=str, ensure_ascii=False) + '\n'
+    
+    # Cerrar al cerrar la respuesta: también en HEAD o si el cliente corta antes de empezar
+    response = Response(generar(), mimetype='application/x-ndjson')
+    response.call_on_close(conn.close)
+    return response
+
+# ========== REPORTES ==========
+
+@app.route('/reportes')
+@login_required
+@admision(max_concurrentes=2)
+def reportes():
+    """Informe de circulación por mes y categoría"""
+    desde, hasta = periodo(request.args.get('desde'), request.args.get('hasta'))
+    filtros = {'desde': desde.strftime('%Y-%m'), 'hasta': (hasta - timedelta(days=1)).strftime('%Y-%m')}
+    
+    if not NUMPY_DISPONIBLE:
+        flash('Los reportes requieren NumPy (pip install -r requirements-analitica.txt)', 'error')
+        return render_template('reportes/index.html', filtros=filtros)
+    
+    # Los vencidos dependen del día actual
+    clave = clave_fragmento('reportes', ('prestamos', 'libros', 'categorias'), date.today())
+    informe_html = cache_fragmentos.obtener(clave)
+    if informe_html is None:
+        conn = get_db_connection()
+        if not conn:
+            return render_template('reportes/index.html', filtros=filtros)
+        try:
+            informe = informe_circulacion(conn, desde, hasta)
+        except ERRORES_BD as e:
+            flash(f'Error al generar el reporte: {e}', 'error')
+            return render_template('reportes/index.html', filtros=filtros)
+        finally:
+            conn.close()
+        informe_html = render_template('reportes/_informe.html', informe=informe)
+        cache_fragmentos.guardar(clave, informe_html)
+    
+    return render_template('reportes/index.html', filtros=filtros, informe_html=Markup(informe_html))
+
 if __name__ == '__main__':
     app.run(debug=True)
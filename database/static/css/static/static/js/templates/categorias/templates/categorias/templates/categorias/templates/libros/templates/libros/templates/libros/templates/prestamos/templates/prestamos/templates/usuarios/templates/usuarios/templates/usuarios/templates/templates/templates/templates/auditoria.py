@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Registro de auditoría asíncrono para el Sistema de Gestión de Biblioteca
+
+Las rutas que modifican datos llaman a `registrar_evento(...)`, que solo
+añade el evento (actor, entidad, cambios) a una cola en memoria y vuelve
+enseguida: la petición no espera ningún INSERT. Un hilo escritor vacía la
+cola en lotes con un único INSERT de varias filas en `eventos_auditoria`.
+
+* La cola está acotada (MAX_EVENTOS_EN_COLA). Si se llena porque la base
+  de datos no responde, los eventos nuevos se descartan y se cuentan en
+  las métricas en lugar de hacer crecer la memoria.
+* Al terminar el proceso (atexit, incluido el apagado ordenado de
+  gunicorn) se escriben los eventos pendientes antes de salir.
+* `iterar_eventos` recorre el registro con filtros y lectura por lotes,
+  para exportarlo sin cargarlo entero en memoria.
+"""
+
+import atexit
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+
+from flask import has_request_context, session
+
+from db import ERRORES_BD
+
+MAX_EVENTOS_EN_COLA = 10000
+TAMANO_LOTE = 150  # 6 parámetros por fila: dentro del límite de 999 de SQLite antiguos
+TAMANO_LECTURA = 500
+INTERVALO_ESCRITURA = 1.0  # segundos máximos que un evento espera en la cola
+MAX_INTENTOS = 3
+ESPERA_CIERRE = 10.0  # segundos para vaciar la cola al terminar
+
+# Campos que nunca se guardan en el registro
+CAMPOS_EXCLUIDOS = {'password'}
+
+COLUMNAS = ('fecha', 'usuario_id', 'accion', 'entidad', 'entidad_id', 'cambios')
+
+_cola = queue.Queue(maxsize=MAX_EVENTOS_EN_COLA)
+_conectar = None
+_escritor = None
+_detener = threading.Event()
+_inicio_lock = threading.Lock()
+
+_metricas = {'encolados': 0, 'escritos': 0, 'lotes': 0, 'descartados': 0, 'fallidos': 0}
+_metricas_lock = threading.Lock()
+
+
+def configurar_auditoria(conectar):
+    """Indicar la función que abre conexiones para el hilo escritor"""
+    global _conectar
+    _conectar = conectar
+
+
+def diferencias(anterior, nuevos):
+    """Campos de `nuevos` cuyo valor cambia respecto a la fila `anterior`"""
+    anterior = anterior or {}
+    return {
+        campo: [anterior.get(campo), valor]
+        for campo, valor in nuevos.items()
+        if campo not in CAMPOS_EXCLUIDOS and str(anterior.get(campo)) != str(valor)
+    }
+
+
+def fila_actual(conn, tabla, id):
+    """Leer la fila que se va a modificar, para calcular las diferencias"""
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(f"SELECT * FROM {tabla} WHERE id = %s", (id,))
+    fila = cursor.fetchone()
+    cursor.close()
+    return fila
+
+
+def registrar_evento(accion, entidad, entidad_id=None, cambios=None):
+    """
+    Encolar un evento de auditoría sin bloquear la petición. El actor es el
+    usuario de la sesión actual.
+    """
+    actor = session.get('user_id') if has_request_context() else None
+    if cambios:
+        cambios = {campo: valor for campo, valor in cambios.items() if campo not in CAMPOS_EXCLUIDOS}
+    evento = (datetime.now(), actor, accion, entidad, entidad_id, cambios or None)
+
+    _iniciar_escritor()
+    try:
+        _cola.put_nowait(evento)
+        _contar('encolados')
+    except queue.Full:
+        _contar('descartados')
+
+
+def _contar(metrica, cantidad=1):
+    with _metricas_lock:
+        _metricas[metrica] += cantidad
+
+
+def _iniciar_escritor():
+    """Arrancar el hilo escritor con el primer evento del proceso"""
+    global _escritor
+    if _escritor is not None:
+        return
+    with _inicio_lock:
+        if _escritor is None:
+            _escritor = threading.Thread(target=_bucle_escritor, name='auditoria', daemon=True)
+            _escritor.start()
+            atexit.register(vaciar_al_cerrar)
+
+
+def _bucle_escritor():
+    """Esperar eventos y escribirlos en lotes hasta que se pida detener"""
+    while not (_detener.is_set() and _cola.empty()):
+        try:
+            primero = _cola.get(timeout=INTERVALO_ESCRITURA)
+        except queue.Empty:
+            continue
+
+        lote = [primero]
+        while len(lote) < TAMANO_LOTE:
+            try:
+                lote.append(_cola.get_nowait())
+            except queue.Empty:
+                break
+        _escribir_lote(lote)
+
+
+def _escribir_lote(lote):
+    """Insertar el lote con un único INSERT de varias filas"""
+    marcadores = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(lote))
+    consulta = f"INSERT INTO eventos_auditoria ({', '.join(COLUMNAS)}) VALUES {marcadores}"
+    params = []
+    for fecha, actor, accion, entidad, entidad_id, cambios in lote:
+        params.extend((fecha, actor, accion, entidad, entidad_id,
+                       json.dumps(cambios, default=str, ensure_ascii=False) if cambios else None))
+
+    for intento in range(1, MAX_INTENTOS + 1):
+        conn = _conectar() if _conectar else None
+        if conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(consulta, params)
+                conn.commit()
+                _contar('escritos', len(lote))
+                _contar('lotes')
+                return
+            except ERRORES_BD as e:
+                print(f"Error escribiendo auditoría (intento {intento}): {e}")
+            finally:
+                cursor.close()
+                conn.close()
+        if intento < MAX_INTENTOS and not _detener.is_set():
+            time.sleep(INTERVALO_ESCRITURA * intento)
+
+    _contar('fallidos', len(lote))
+
+
+def vaciar_al_cerrar(espera=ESPERA_CIERRE):
+    """Escribir los eventos pendientes y detener el hilo escritor"""
+    _detener.set()
+    if _escritor is not None:
+        _escritor.join(espera)
+
+
+def obtener_metricas_auditoria():
+    """Contadores del registro de auditoría y eventos en cola"""
+    with _metricas_lock:
+        metricas = dict(_metricas)
+    metricas['en_cola'] = _cola.qsize()
+    return metricas
+
+
+def iterar_eventos(conn, entidad=None, entidad_id=None, usuario_id=None,
+                   desde=None, hasta=None, tamano_lote=TAMANO_LECTURA):
+    """
+    Generador de eventos (del más reciente al más antiguo) que cumplen los
+    filtros, leídos por lotes. Cierra el cursor al terminar.
+    """
+    condiciones = []
+    params = []
+    for columna, operador, valor in (('entidad', '=', entidad), ('entidad_id', '=', entidad_id),
+                                     ('usuario_id', '=', usuario_id), ('fecha', '>=', desde),
+                                     ('fecha', '<', hasta)):
+        if valor is not None:
+            condiciones.append(f"{columna} {operador} %s")
+            params.append(valor)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"SELECT * FROM eventos_auditoria {where} ORDER BY id DESC", params)
+        while True:
+            filas = cursor.fetchmany(tamano_lote)
+            if not filas:
+                break
+            for fila in filas:
+                if isinstance(fila['cambios'], (str, bytes)):
+                    fila['cambios'] = json.loads(fila['cambios'])
+                yield fila
+    finally:
+        try:
+            cursor.close()
+        except ERRORES_BD:
+            # Lectura interrumpida: quedan filas sin leer en el servidor
+            pass
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de concurrencia: rutas síncronas (app.py) frente a la API asíncrona (api.py)
+
+Inicia sesión en la aplicación web, reutiliza la cookie de sesión para
+ambos servicios y lanza el mismo número de peticiones concurrentes contra
+cada URL, mostrando peticiones por segundo y latencias.
+
+Uso (con ambos servidores en marcha):
+    python benchmark_api.py --web http://127.0.0.1:5000 --api http://127.0.0.1:5001 \
+        --email admin@biblioteca.com --password admin123 -n 500 -c 50
+"""
+
+import argparse
+import http.cookiejar
+import statistics
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def iniciar_sesion(web, email, password):
+    """Hacer login y retornar el valor de la cabecera Cookie"""
+    cookies = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(cookies))
+    datos = urllib.parse.urlencode({'email': email, 'password': password}).encode()
+    opener.open(f"{web}/login", datos).read()
+
+    if not any(cookie.name == 'session' for cookie in cookies):
+        raise SystemExit("❌ No se pudo iniciar sesión: revisa las credenciales")
+    return '; '.join(f"{cookie.name}={cookie.value}" for cookie in cookies)
+
+
+def medir(url, cookie, total, concurrencia):
+    """Lanzar `total` GET con `concurrencia` hilos; retorna métricas"""
+    def peticion(_):
+        inicio = time.perf_counter()
+        req = urllib.request.Request(url, headers={'Cookie': cookie})
+        try:
+            with urllib.request.urlopen(req) as respuesta:
+                respuesta.read()
+                ok = respuesta.status == 200
+        except OSError:
+            ok = False
+        return time.perf_counter() - inicio, ok
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+        resultados = list(executor.map(peticion, range(total)))
+    duracion = time.perf_counter() - inicio
+
+    latencias = sorted(latencia for latencia, _ in resultados)
+    return {
+        'peticiones_por_segundo': total / duracion,
+        'errores': sum(1 for _, ok in resultados if not ok),
+        'p50_ms': statistics.median(latencias) * 1000,
+        'p95_ms': latencias[int(len(latencias) * 0.95) - 1] * 1000
+    }
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--web', default='http://127.0.0.1:5000')
+    parser.add_argument('--api', default='http://127.0.0.1:5001')
+    parser.add_argument('--email', default='admin@biblioteca.com')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--recurso', default='libros')
+    parser.add_argument('-n', '--total', type=int, default=500)
+    parser.add_argument('-c', '--concurrencia', type=int, default=50)
+    args = parser.parse_args()
+
+    cookie = iniciar_sesion(args.web, args.email, args.password)
+    objetivos = [
+        ("Flask síncrono", f"{args.web}/{args.recurso}"),
+        ("API asíncrona", f"{args.api}/api/v1/{args.recurso}?limite=500")
+    ]
+
+    print(f"📊 {args.total} peticiones, {args.concurrencia} concurrentes")
+    for nombre, url in objetivos:
+        m = medir(url, cookie, args.total, args.concurrencia)
+        print(f"{nombre:16} {m['peticiones_por_segundo']:8.1f} req/s  "
+              f"p50 {m['p50_ms']:7.1f} ms  p95 {m['p95_ms']:7.1f} ms  "
+              f"errores {m['errores']}")
+
+
+if __name__ == '__main__':
+    main()
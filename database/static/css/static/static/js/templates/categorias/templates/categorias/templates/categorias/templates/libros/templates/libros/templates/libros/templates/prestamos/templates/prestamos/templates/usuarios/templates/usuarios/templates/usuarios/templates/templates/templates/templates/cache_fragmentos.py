@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Caché de fragmentos renderizados para el Sistema de Gestión de Biblioteca
+
+Renderizar las tablas de `libros/index.html` y `prestamos/index.html` con
+miles de filas cuesta más CPU que las propias consultas. Este módulo guarda
+el HTML ya renderizado de esas tablas, con una clave que combina la versión
+de las tablas de las que depende (ver versiones.py) y los parámetros de la
+página, de modo que peticiones idénticas de distintos bibliotecarios
+reutilizan un solo renderizado.
+
+La expulsión es LRU y está limitada por memoria, no por número de entradas.
+
+Los listados que se envían en streaming también se guardan: el fragmento se
+va copiando mientras se envía y se guarda solo si el envío llega al final.
+Esa copia ocupa memoria durante todo el envío, así que los fragmentos de más
+de MAXIMO_STREAMING bytes no se guardan y se vuelven a renderizar.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+from versiones import calcular_etag
+
+# Memoria máxima ocupada por los fragmentos (bytes)
+MEMORIA_MAXIMA = 32 * 1024 * 1024
+
+# Tamaño máximo de un fragmento en streaming que se copia para guardarlo (bytes)
+MAXIMO_STREAMING = 8 * 1024 * 1024
+
+
+class CacheFragmentos:
+    """Caché LRU de cadenas HTML con límite de memoria"""
+
+    def __init__(self, memoria_maxima=MEMORIA_MAXIMA, maximo_streaming=MAXIMO_STREAMING):
+        self.memoria_maxima = memoria_maxima
+        self.maximo_streaming = maximo_streaming
+        self._entradas = OrderedDict()
+        self._memoria = 0
+        self._aciertos = 0
+        self._fallos = 0
+        self._expulsiones = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        """Retorna el fragmento guardado o None, actualizando su uso"""
+        with self._lock:
+            html = self._entradas.get(clave)
+            if html is None:
+                self._fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self._aciertos += 1
+            return html
+
+    def guardar(self, clave, html):
+        """Guardar un fragmento, expulsando los menos usados si hace falta"""
+        html = str(html)
+        tamano = sys.getsizeof(html)
+        if tamano > self.memoria_maxima:
+            return
+
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._memoria -= sys.getsizeof(anterior)
+
+            while self._entradas and self._memoria + tamano > self.memoria_maxima:
+                _, expulsado = self._entradas.popitem(last=False)
+                self._memoria -= sys.getsizeof(expulsado)
+                self._expulsiones += 1
+
+            self._entradas[clave] = html
+            self._memoria += tamano
+
+    def guardar_al_terminar(self, clave, trozos):
+        """
+        Reenviar los trozos de un fragmento renderizado en streaming y
+        guardarlo al terminar. Si el envío se corta (cliente desconectado,
+        error de la BD) o el fragmento supera `maximo_streaming`, no se guarda.
+        """
+        copia = []
+        tamano = 0
+        for trozo in trozos:
+            if copia is not None:
+                tamano += len(trozo)
+                if tamano > self.maximo_streaming:
+                    copia = None
+                else:
+                    copia.append(trozo)
+            yield trozo
+
+        if copia is not None:
+            self.guardar(clave, ''.join(copia))
+
+    def limpiar(self):
+        """Vaciar la caché (las estadísticas se conservan)"""
+        with self._lock:
+            self._entradas.clear()
+            self._memoria = 0
+
+    def estadisticas(self):
+        """Tasa de aciertos y uso de memoria para ajustar el tamaño"""
+        with self._lock:
+            consultas = self._aciertos + self._fallos
+            return {
+                'entradas': len(self._entradas),
+                'memoria_bytes': self._memoria,
+                'memoria_maxima_bytes': self.memoria_maxima,
+                'aciertos': self._aciertos,
+                'fallos': self._fallos,
+                'expulsiones': self._expulsiones,
+                'tasa_aciertos': self._aciertos / consultas if consultas else 0.0
+            }
+
+
+def clave_fragmento(nombre, tablas, *extra):
+    """Clave de caché: fragmento, versión de las tablas y parámetros de la URL"""
+    parametros = tuple(sorted(request.args.items(multi=True)))
+    return (nombre, calcular_etag(tablas, *extra), parametros)
+
+
+cache_fragmentos = CacheFragmentos()
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Capa de acceso a datos para el Sistema de Gestión de Biblioteca
+
+Permite ejecutar la aplicación sobre MySQL (por defecto) o sobre SQLite
+embebido, para sucursales pequeñas y para pruebas rápidas. El motor se
+elige con variables de entorno:
+
+    DB_BACKEND=mysql | sqlite
+    SQLITE_PATH=biblioteca.db   (":memory:" para una base en memoria)
+
+Cada nodo de la configuración de sucursales (`sucursales.py`) pasa su
+propio `db_config`; con SQLite la clave `sqlite_path` indica el archivo
+del nodo.
+
+Con SQLite la conexión devuelta imita la interfaz de mysql.connector que
+usan las rutas: `cursor(dictionary=True)`, parámetros `%s`, `rowcount`,
+`fetchmany`... Los `SELECT ... FOR UPDATE` se traducen a `BEGIN IMMEDIATE`,
+que toma el bloqueo de escritura en el mismo punto de la transacción. La
+base se crea con `database/biblioteca_sqlite.sql` si todavía no existe.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+
+import mysql.connector
+
+BACKEND = os.environ.get('DB_BACKEND', 'mysql').lower()
+SQLITE_PATH = os.environ.get('SQLITE_PATH', 'biblioteca.db')
+
+def _buscar_esquema():
+    """`database/biblioteca_sqlite.sql` en el directorio de la app o en el más cercano por encima"""
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        ruta = os.path.join(directorio, 'database', 'biblioteca_sqlite.sql')
+        if os.path.exists(ruta):
+            return ruta
+        padre = os.path.dirname(directorio)
+        if padre == directorio:
+            return None
+        directorio = padre
+
+
+SQLITE_SCHEMA = os.environ.get('SQLITE_SCHEMA') or _buscar_esquema()
+SQLITE_TIMEOUT = 5.0  # segundos de espera ante un bloqueo de escritura
+
+
+class NodoNoDisponible(Exception):
+    """No se pudo abrir la conexión con un nodo de la base de datos"""
+
+
+# Excepciones de cualquiera de los dos motores y de nodos inaccesibles
+ERRORES_BD = (mysql.connector.Error, sqlite3.Error, NodoNoDisponible)
+
+_PATRON_FOR_UPDATE = re.compile(r'\s+FOR\s+UPDATE\b', re.IGNORECASE)
+_URI_MEMORIA = 'file:biblioteca_memoria?mode=memory&cache=shared'
+
+_inicializacion_lock = threading.Lock()
+_inicializadas = set()
+_conexion_memoria = None  # Mantiene viva la base en memoria compartida
+
+# Conversión de fechas entre Python y las columnas DATE/TIMESTAMP
+sqlite3.register_adapter(date, lambda valor: valor.isoformat())
+sqlite3.register_adapter(datetime, lambda valor: valor.isoformat(' '))
+sqlite3.register_converter('DATE', lambda valor: date.fromisoformat(valor.decode()))
+sqlite3.register_converter('TIMESTAMP', lambda valor: datetime.fromisoformat(valor.decode()))
+
+
+class CursorSQLite:
+    """Cursor de sqlite3 con la interfaz de mysql.connector usada en la app"""
+
+    def __init__(self, conexion, dictionary=False):
+        self._conexion = conexion
+        self._cursor = conexion.cursor()
+        self._dictionary = dictionary
+
+    def execute(self, consulta, params=()):
+        if _PATRON_FOR_UPDATE.search(consulta):
+            consulta = _PATRON_FOR_UPDATE.sub('', consulta)
+            if not self._conexion.in_transaction:
+                self._cursor.execute('BEGIN IMMEDIATE')
+        self._cursor.execute(consulta.replace('%s', '?'), tuple(params or ()))
+
+    def executemany(self, consulta, filas):
+        self._cursor.executemany(consulta.replace('%s', '?'), [tuple(fila) for fila in filas])
+
+    def _convertir(self, fila):
+        if fila is None or not self._dictionary:
+            return fila
+        columnas = [columna[0] for columna in self._cursor.description]
+        return dict(zip(columnas, fila))
+
+    def fetchone(self):
+        return self._convertir(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._convertir(fila) for fila in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._convertir(fila) for fila in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class ConexionSQLite:
+    """Conexión de sqlite3 con la interfaz de mysql.connector usada en la app"""
+
+    def __init__(self, conexion):
+        self._conexion = conexion
+
+    def cursor(self, dictionary=False, **kwargs):
+        return CursorSQLite(self._conexion, dictionary)
+
+    def commit(self):
+        self._conexion.commit()
+
+    def rollback(self):
+        self._conexion.rollback()
+
+    def close(self):
+        self._conexion.close()
+
+    def is_connected(self):
+        return True
+
+
+def _abrir_sqlite(ruta):
+    """Abrir una conexión sqlite3 configurada (claves foráneas, WAL, fechas)"""
+    if ruta == ':memory:':
+        conexion = sqlite3.connect(_URI_MEMORIA, uri=True, timeout=SQLITE_TIMEOUT,
+                                   detect_types=sqlite3.PARSE_DECLTYPES,
+                                   check_same_thread=False)
+    else:
+        conexion = sqlite3.connect(ruta, timeout=SQLITE_TIMEOUT,
+                                   detect_types=sqlite3.PARSE_DECLTYPES,
+                                   check_same_thread=False)
+        conexion.execute('PRAGMA journal_mode = WAL')
+        conexion.execute('PRAGMA synchronous = NORMAL')
+    conexion.execute('PRAGMA foreign_keys = ON')
+    # Peso de ordenación del texto, como en MySQL: con la colación BINARY
+    # por defecto de SQLite son los bytes UTF-8 de la cadena
+    conexion.create_function('WEIGHT_STRING', 1,
+                             lambda texto: None if texto is None else str(texto).encode('utf-8'),
+                             deterministic=True)
+    return conexion
+
+
+def inicializar_sqlite(ruta=None):
+    """Crear el esquema y los datos de prueba si la base está vacía"""
+    global _conexion_memoria
+    ruta = ruta or SQLITE_PATH
+
+    with _inicializacion_lock:
+        if ruta in _inicializadas:
+            return
+
+        conexion = _abrir_sqlite(ruta)
+        existe = conexion.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'usuarios'"
+        ).fetchone()
+        if not existe:
+            if not SQLITE_SCHEMA or not os.path.exists(SQLITE_SCHEMA):
+                conexion.close()
+                raise sqlite3.OperationalError(
+                    f"No se encontró el esquema de SQLite ({SQLITE_SCHEMA or 'database/biblioteca_sqlite.sql'}); "
+                    "indica su ruta con SQLITE_SCHEMA"
+                )
+            with open(SQLITE_SCHEMA, encoding='utf-8') as f:
+                conexion.executescript(f.read())
+            conexion.commit()
+
+        if ruta == ':memory:':
+            _conexion_memoria = conexion
+        else:
+            conexion.close()
+        _inicializadas.add(ruta)
+
+
+def conectar(db_config):
+    """Abrir una conexión con el motor configurado en DB_BACKEND"""
+    if BACKEND == 'sqlite':
+        ruta = db_config.get('sqlite_path', SQLITE_PATH)
+        inicializar_sqlite(ruta)
+        return ConexionSQLite(_abrir_sqlite(ruta))
+    return mysql.connector.connect(**db_config)
+
+
+def listar_tablas(conn):
+    """Nombres de las tablas de la base de datos actual"""
+    cursor = conn.cursor()
+    if BACKEND == 'sqlite':
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")
+    else:
+        cursor.execute("SHOW TABLES")
+    tablas = [fila[0] for fila in cursor.fetchall()]
+    cursor.close()
+    return tablas
+
+
+def estimar_filas(conn):
+    """
+    Número aproximado de filas de cada tabla, sin recorrerlas con COUNT(*):
+    estadísticas de information_schema en MySQL y el mayor rowid en SQLite
+    (None en tablas WITHOUT ROWID).
+    """
+    cursor = conn.cursor()
+    estimaciones = {}
+    if BACKEND == 'sqlite':
+        for tabla in listar_tablas(conn):
+            try:
+                cursor.execute(f'SELECT COALESCE(MAX(rowid), 0) FROM "{tabla}"')
+                estimaciones[tabla] = cursor.fetchone()[0]
+            except sqlite3.Error:
+                estimaciones[tabla] = None
+    else:
+        cursor.execute("""
+            SELECT TABLE_NAME, TABLE_ROWS FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE'
+        """)
+        estimaciones = {tabla: filas for tabla, filas in cursor.fetchall()}
+    cursor.close()
+    return estimaciones
+
+
+def es_bloqueo(error):
+    """Indica si el error es un conflicto de bloqueo de SQLite"""
+    return isinstance(error, sqlite3.OperationalError) and (
+        'locked' in str(error) or 'busy' in str(error)
+    )
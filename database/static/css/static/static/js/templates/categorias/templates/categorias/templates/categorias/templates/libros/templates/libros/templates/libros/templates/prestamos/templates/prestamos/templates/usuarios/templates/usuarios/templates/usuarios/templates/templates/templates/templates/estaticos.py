@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Recursos estáticos con huella y precompresión para el Sistema de Gestión de Biblioteca
+
+Ejecutado como script genera, para cada CSS/JS de `static/`, una copia con
+el hash de su contenido en `static/dist/` junto con sus variantes `.gz` y
+`.br`, y un `static/dist/manifest.json` que asocia cada nombre original con
+su versión con huella:
+
+    python estaticos.py
+
+Desde la aplicación, `configurar_estaticos(app)` hace que
+`url_for('static', filename='css/custom.css')` apunte al archivo con huella,
+sirve la variante precomprimida que acepte el navegador y marca los
+archivos con huella como `Cache-Control: immutable`. Un proxy frontal puede
+servir `static/dist/` directamente (p. ej. nginx con `gzip_static` y
+`brotli_static`).
+
+La compresión Brotli requiere el paquete opcional `Brotli`.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+
+from flask import abort, current_app, request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+EXTENSIONES = ('.css', '.js')
+DIRECTORIO_SALIDA = 'dist'
+MANIFIESTO = 'manifest.json'
+LONGITUD_HASH = 10
+UN_ANIO = 365 * 24 * 60 * 60
+
+
+def calcular_huella(contenido):
+    """Hash corto del contenido de un archivo"""
+    return hashlib.sha256(contenido).hexdigest()[:LONGITUD_HASH]
+
+
+def compilar(directorio_static):
+    """
+    Generar los archivos con huella y sus variantes comprimidas.
+    Retorna el manifiesto {nombre_original: nombre_con_huella}.
+    """
+    salida = os.path.join(directorio_static, DIRECTORIO_SALIDA)
+    manifiesto = {}
+
+    for raiz, directorios, archivos in os.walk(directorio_static):
+        # No procesar la propia salida de compilaciones anteriores
+        if os.path.abspath(raiz) == os.path.abspath(directorio_static):
+            directorios[:] = [d for d in directorios if d != DIRECTORIO_SALIDA]
+
+        for archivo in sorted(archivos):
+            if not archivo.endswith(EXTENSIONES):
+                continue
+
+            origen = os.path.join(raiz, archivo)
+            relativo = os.path.relpath(origen, directorio_static).replace(os.sep, '/')
+            with open(origen, 'rb') as f:
+                contenido = f.read()
+
+            base, extension = os.path.splitext(relativo)
+            con_huella = f"{DIRECTORIO_SALIDA}/{base}.{calcular_huella(contenido)}{extension}"
+            destino = os.path.join(directorio_static, *con_huella.split('/'))
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+
+            with open(destino, 'wb') as f:
+                f.write(contenido)
+            with open(destino + '.gz', 'wb') as f:
+                f.write(gzip.compress(contenido, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(destino + '.br', 'wb') as f:
+                    f.write(brotli.compress(contenido, quality=11))
+
+            manifiesto[relativo] = con_huella
+
+    os.makedirs(salida, exist_ok=True)
+    with open(os.path.join(salida, MANIFIESTO), 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=2, sort_keys=True)
+
+    return manifiesto
+
+
+def cargar_manifiesto(directorio_static):
+    """Leer el manifiesto generado por `compilar`; vacío si no existe"""
+    ruta = os.path.join(directorio_static, DIRECTORIO_SALIDA, MANIFIESTO)
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def configurar_estaticos(app):
+    """Reescribir url_for('static') y servir variantes precomprimidas"""
+    directorio_static = app.static_folder
+    manifiesto = cargar_manifiesto(directorio_static)
+    inmutables = set(manifiesto.values())
+
+    @app.url_defaults
+    def aplicar_huella(endpoint, values):
+        # En modo debug se sirven los originales para ver los cambios al instante
+        if endpoint != 'static' or current_app.debug:
+            return
+        nombre = values.get('filename')
+        if nombre in manifiesto:
+            values['filename'] = manifiesto[nombre]
+
+    def servir_estatico(filename):
+        ruta = safe_join(directorio_static, filename)
+        if ruta is None or not os.path.isfile(ruta):
+            abort(404)
+
+        mimetype = mimetypes.guess_type(filename)[0]
+        for codificacion, extension in (('br', '.br'), ('gzip', '.gz')):
+            if request.accept_encodings[codificacion] and os.path.isfile(ruta + extension):
+                response = send_from_directory(directorio_static, filename + extension,
+                                               mimetype=mimetype)
+                response.headers['Content-Encoding'] = codificacion
+                break
+        else:
+            response = send_from_directory(directorio_static, filename)
+
+        response.vary.add('Accept-Encoding')
+        if filename in inmutables:
+            response.cache_control.public = True
+            response.cache_control.max_age = UN_ANIO
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+        return response
+
+    app.view_functions['static'] = servir_estatico
+
+
+def main():
+    """Compilar los recursos de la carpeta static junto a este script"""
+    directorio_static = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    if not os.path.isdir(directorio_static):
+        print(f"❌ No existe el directorio {directorio_static}")
+        sys.exit(1)
+
+    manifiesto = compilar(directorio_static)
+    for original, con_huella in sorted(manifiesto.items()):
+        print(f"✅ {original} → {con_huella}")
+    if brotli is None:
+        print("⚠️  Paquete Brotli no instalado: solo se generaron variantes .gz")
+    print(f"📦 {len(manifiesto)} archivos en static/{DIRECTORIO_SALIDA}/")
+
+
+if __name__ == '__main__':
+    main()
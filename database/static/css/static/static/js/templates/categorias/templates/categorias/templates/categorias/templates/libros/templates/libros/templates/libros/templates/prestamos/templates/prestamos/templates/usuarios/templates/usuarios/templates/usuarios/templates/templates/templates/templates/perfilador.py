@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+Perfilado bajo demanda de peticiones para el Sistema de Gestión de Biblioteca
+
+Cuando una ruta se vuelve lenta en producción, este módulo permite ver si
+el tiempo se va en el driver, en el cursor, en Jinja o en el hash de
+contraseñas. Una petición se perfila si:
+
+* la hace un administrador con la cabecera `X-Perfilar: 1` o el parámetro
+  `?perfilar=1` (la respuesta indica el archivo en la cabecera `X-Perfil`), o
+* cae en la fracción de muestreo automático `PERFIL_FRACCION` (por
+  defecto 0, desactivado).
+
+Durante la petición un hilo muestrea la pila del hilo que la atiende y, al
+terminar, se escriben en `PERFIL_DIR` dos archivos:
+
+* `<fecha>_<ruta>.folded`: pilas colapsadas, una por línea con su número
+  de muestras; se abren con speedscope o `flamegraph.pl`.
+* `<fecha>_<ruta>.json`: ruta, estado, duración y resumen de las consultas
+  SQL ejecutadas (veces, tiempo de ejecución y de lectura, filas).
+
+Las consultas que la petición lanza en otros hilos (lecturas de varios
+nodos con `sucursales.dispersar`) se registran en el mismo perfil: el
+hilo que las lanza pasa `consultas_en_curso()` y cada hilo envuelve su
+conexión con `perfilar_conexion(conn, consultas)`.
+
+Sin perfilado activo el coste por petición es una comprobación de
+cabecera y parámetro. En respuestas en streaming solo se perfila hasta que
+la vista devuelve el generador.
+"""
+
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import g, has_request_context, request, session
+
+FRACCION_MUESTREO = float(os.environ.get('PERFIL_FRACCION', '0'))
+DIRECTORIO = os.environ.get('PERFIL_DIR', 'perfiles')
+INTERVALO_MUESTREO = 0.002  # segundos entre muestras de la pila
+MAX_ARCHIVOS = 200  # perfiles conservados (los más antiguos se borran)
+CABECERA = 'X-Perfilar'
+
+_ESPACIOS = re.compile(r'\s+')
+_registro_lock = threading.Lock()  # Varios hilos pueden registrar en el mismo perfil
+
+
+class Muestreador(threading.Thread):
+    """Hilo que cuenta las pilas de otro hilo a intervalos regulares"""
+
+    def __init__(self, hilo_id, intervalo=INTERVALO_MUESTREO):
+        super().__init__(name='perfilador', daemon=True)
+        self.hilo_id = hilo_id
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self._detener = threading.Event()
+
+    def run(self):
+        while not self._detener.wait(self.intervalo):
+            frame = sys._current_frames().get(self.hilo_id)
+            if frame is None:
+                break
+            pila = []
+            while frame is not None:
+                codigo = frame.f_code
+                pila.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                frame = frame.f_back
+            self.pilas[';'.join(reversed(pila))] += 1
+
+    def detener(self):
+        self._detener.set()
+        self.join()
+
+
+class CursorPerfilado:
+    """Cursor que mide cada consulta y la lectura de sus filas"""
+
+    def __init__(self, cursor, consultas):
+        self._cursor = cursor
+        self._consultas = consultas
+        self._actual = None
+
+    def _medir(self, campo, inicio, filas=0):
+        if self._actual is not None:
+            with _registro_lock:
+                self._actual[campo] += (time.perf_counter() - inicio) * 1000
+                self._actual['filas'] += filas
+
+    def _registrar(self, consulta):
+        texto = _ESPACIOS.sub(' ', consulta).strip()[:200]
+        with _registro_lock:
+            self._actual = self._consultas.setdefault(
+                texto, {'veces': 0, 'ms_ejecucion': 0.0, 'ms_lectura': 0.0, 'filas': 0}
+            )
+            self._actual['veces'] += 1
+
+    def execute(self, consulta, params=()):
+        self._registrar(consulta)
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.execute(consulta, params)
+        finally:
+            self._medir('ms_ejecucion', inicio)
+
+    def executemany(self, consulta, filas):
+        self._registrar(consulta)
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.executemany(consulta, filas)
+        finally:
+            self._medir('ms_ejecucion', inicio)
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        fila = self._cursor.fetchone()
+        self._medir('ms_lectura', inicio, fila is not None)
+        return fila
+
+    def fetchmany(self, size=1):
+        inicio = time.perf_counter()
+        filas = self._cursor.fetchmany(size)
+        self._medir('ms_lectura', inicio, len(filas))
+        return filas
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        filas = self._cursor.fetchall()
+        self._medir('ms_lectura', inicio, len(filas))
+        return filas
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+
+class ConexionPerfilada:
+    """Conexión cuyos cursores registran las consultas de la petición"""
+
+    def __init__(self, conexion, consultas):
+        self._conexion = conexion
+        self._consultas = consultas
+
+    def cursor(self, *args, **kwargs):
+        return CursorPerfilado(self._conexion.cursor(*args, **kwargs), self._consultas)
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+
+def consultas_en_curso():
+    """Registro de consultas de la petición actual si se está perfilando, o None"""
+    if has_request_context() and 'perfil' in g:
+        return g.perfil['consultas']
+    return None
+
+
+def perfilar_conexion(conexion, consultas=None):
+    """
+    Envolver la conexión si la petición actual se está perfilando. Desde
+    otros hilos, sin contexto de petición, se pasa el registro `consultas`
+    obtenido con `consultas_en_curso()` en el hilo de la petición.
+    """
+    if consultas is None:
+        consultas = consultas_en_curso()
+    if conexion is not None and consultas is not None:
+        return ConexionPerfilada(conexion, consultas)
+    return conexion
+
+
+def _solicitado():
+    """Perfilado pedido explícitamente por un administrador"""
+    pedido = request.headers.get(CABECERA) == '1' or request.args.get('perfilar') == '1'
+    return pedido and session.get('user_role') == 'admin'
+
+
+def _iniciar():
+    if request.endpoint == 'static':
+        return
+    solicitado = _solicitado()
+    if not solicitado and not (FRACCION_MUESTREO and random.random() < FRACCION_MUESTREO):
+        return
+
+    muestreador = Muestreador(threading.get_ident())
+    g.perfil = {
+        'solicitado': solicitado,
+        'inicio': time.perf_counter(),
+        'consultas': {},
+        'muestreador': muestreador
+    }
+    muestreador.start()
+
+
+def _finalizar(estado):
+    """Detener el muestreo y escribir el perfil; retorna el nombre base del archivo"""
+    perfil = g.pop('perfil', None)
+    if perfil is None:
+        return None
+    perfil['muestreador'].detener()
+    duracion_ms = (time.perf_counter() - perfil['inicio']) * 1000
+
+    os.makedirs(DIRECTORIO, exist_ok=True)
+    nombre = f"{datetime.now():%Y%m%d_%H%M%S_%f}_{request.endpoint or 'desconocido'}"
+    ruta = os.path.join(DIRECTORIO, nombre)
+
+    with open(ruta + '.folded', 'w', encoding='utf-8') as f:
+        for pila, muestras in perfil['muestreador'].pilas.most_common():
+            f.write(f"{pila} {muestras}\n")
+
+    consultas = sorted(perfil['consultas'].items(),
+                       key=lambda item: item[1]['ms_ejecucion'] + item[1]['ms_lectura'],
+                       reverse=True)
+    resumen = {
+        'ruta': request.endpoint,
+        'metodo': request.method,
+        'url': request.full_path,
+        'estado': estado,
+        'duracion_ms': round(duracion_ms, 2),
+        'muestras': sum(perfil['muestreador'].pilas.values()),
+        'intervalo_muestreo_ms': INTERVALO_MUESTREO * 1000,
+        'sql': {
+            'consultas': sum(datos['veces'] for _, datos in consultas),
+            'ms_total': round(sum(datos['ms_ejecucion'] + datos['ms_lectura'] for _, datos in consultas), 2),
+            'detalle': [
+                dict(datos, consulta=texto, ms_ejecucion=round(datos['ms_ejecucion'], 2),
+                     ms_lectura=round(datos['ms_lectura'], 2))
+                for texto, datos in consultas
+            ]
+        }
+    }
+    with open(ruta + '.json', 'w', encoding='utf-8') as f:
+        json.dump(resumen, f, ensure_ascii=False, indent=2)
+
+    _rotar()
+    return nombre if perfil['solicitado'] else None
+
+
+def _rotar():
+    """Conservar solo los MAX_ARCHIVOS perfiles más recientes"""
+    perfiles = sorted(archivo for archivo in os.listdir(DIRECTORIO) if archivo.endswith('.folded'))
+    for archivo in perfiles[:-MAX_ARCHIVOS]:
+        base = os.path.join(DIRECTORIO, archivo[:-len('.folded')])
+        for extension in ('.folded', '.json'):
+            try:
+                os.remove(base + extension)
+            except OSError:
+                pass
+
+
+def configurar_perfilador(app):
+    """Registrar los hooks de perfilado en la aplicación"""
+
+    @app.before_request
+    def iniciar_perfil():
+        _iniciar()
+
+    @app.after_request
+    def terminar_perfil(response):
+        if 'perfil' in g:
+            nombre = _finalizar(response.status_code)
+            if nombre:
+                response.headers['X-Perfil'] = nombre
+        return response
+
+    @app.teardown_request
+    def descartar_perfil(error=None):
+        # Excepciones no controladas: after_request no se ejecuta
+        if 'perfil' in g:
+            _finalizar(500)
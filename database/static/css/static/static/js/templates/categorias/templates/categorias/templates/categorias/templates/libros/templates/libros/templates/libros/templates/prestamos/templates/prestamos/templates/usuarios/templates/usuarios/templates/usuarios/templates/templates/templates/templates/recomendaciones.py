@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice de recomendaciones por co-préstamo para el Sistema de Gestión de Biblioteca
+
+Calcula fuera de línea "quienes prestaron este libro también prestaron..."
+sin autouniones de `prestamos` en cada petición. Los pares
+`(usuario_id, libro_id)` se leen por lotes en una matriz dispersa
+usuario × libro (SciPy) y la matriz de co-ocurrencia libro × libro se
+obtiene con un único producto `Bᵀ·B`. Para cada libro se guardan los K
+vecinos con más usuarios en común en la tabla `libros_recomendados`, de
+modo que la aplicación los obtiene con una sola lectura por clave primaria.
+
+La matriz completa y el último `prestamos.id` procesado se conservan en
+`RECOMENDACIONES_MATRIZ` (por defecto `recomendaciones.npz`). En cada
+ejecución solo se leen los historiales de los usuarios con préstamos
+nuevos, se suma la diferencia a la matriz y se reescriben únicamente los
+libros afectados:
+
+    python recomendaciones.py             # actualización incremental
+    python recomendaciones.py --completo  # reconstrucción desde cero
+
+Los préstamos eliminados no se descuentan en modo incremental; conviene
+programar de vez en cuando una reconstrucción completa.
+
+Con varias sucursales (`sucursales.py`) cada nodo calcula las
+recomendaciones de sus propios libros, con su propia matriz
+(`recomendaciones.<nodo>.npz`). Los ids de libro se desplazan al inicio
+del bloque del nodo para que la matriz no crezca con el bloque:
+
+    python recomendaciones.py --nodo norte
+
+Requiere `pip install -r requirements-analitica.txt` (NumPy y SciPy).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from scipy import sparse
+
+from app import get_db_connection
+from db import ERRORES_BD
+from sucursales import RANGO_IDS, listar_nodos, nodo_principal
+
+VECINOS_POR_LIBRO = 10
+TAMANO_LOTE = 10000  # filas leídas por fetchmany
+LIBROS_POR_ESCRITURA = 500
+RUTA_MATRIZ = os.environ.get('RECOMENDACIONES_MATRIZ', 'recomendaciones.npz')
+
+
+def ruta_matriz(nodo, ruta=RUTA_MATRIZ):
+    """Archivo de la matriz del nodo (el del principal no cambia de nombre)"""
+    if nodo.bloque == 0:
+        return ruta
+    nombre, extension = os.path.splitext(ruta)
+    return f"{nombre}.{nodo.nombre}{extension}"
+
+
+def leer_pares(conn, consulta, params=(), base=0, tamano_lote=TAMANO_LOTE):
+    """
+    Leer por lotes las filas `(prestamo_id, usuario_id, libro_id)` de la
+    consulta y devolverlas como tres arrays de enteros, con los libros
+    desplazados `base` posiciones (inicio del bloque de ids del nodo).
+    """
+    cursor = conn.cursor()
+    lotes = []
+    try:
+        cursor.execute(consulta, params)
+        while True:
+            filas = cursor.fetchmany(tamano_lote)
+            if not filas:
+                break
+            lotes.append(np.array(filas, dtype=np.int64).reshape(-1, 3))
+    finally:
+        cursor.close()
+
+    pares = np.concatenate(lotes) if lotes else np.empty((0, 3), dtype=np.int64)
+    return pares[:, 0], pares[:, 1], pares[:, 2] - base
+
+
+def coocurrencias(usuarios, libros, n_libros):
+    """
+    Matriz libro × libro con el número de usuarios que prestaron ambos.
+    Varios préstamos del mismo libro por el mismo usuario cuentan una vez.
+    """
+    _, filas = np.unique(usuarios, return_inverse=True)
+    n_usuarios = int(filas.max()) + 1 if len(filas) else 0
+    prestados = sparse.csr_matrix(
+        (np.ones(len(libros), dtype=np.int32), (filas, libros)),
+        shape=(n_usuarios, n_libros)
+    )
+    prestados.data[:] = 1  # los duplicados se suman al construir la matriz
+
+    matriz = (prestados.T @ prestados).tocsr()
+    matriz.setdiag(0)
+    matriz.eliminate_zeros()
+    return matriz
+
+
+def vecinos_principales(matriz, libros, k=VECINOS_POR_LIBRO):
+    """
+    Generar `(libro_id, vecinos, coincidencias)` con los K vecinos de cada
+    libro, ordenados por coincidencias y, a igualdad, por id.
+    """
+    for libro_id in libros:
+        inicio, fin = matriz.indptr[libro_id], matriz.indptr[libro_id + 1]
+        vecinos = matriz.indices[inicio:fin]
+        cuentas = matriz.data[inicio:fin]
+        if len(vecinos) > k:
+            seleccion = np.argpartition(-cuentas, k - 1)[:k]
+            vecinos, cuentas = vecinos[seleccion], cuentas[seleccion]
+        orden = np.lexsort((vecinos, -cuentas))
+        yield int(libro_id), vecinos[orden], cuentas[orden]
+
+
+def guardar_vecinos(conn, vecinos, completo=False, base=0):
+    """
+    Reescribir las filas de `libros_recomendados` de los libros indicados en
+    una sola transacción; con `completo` se vacía antes la tabla entera.
+    Los ids de `vecinos` están desplazados `base` posiciones.
+    """
+    cursor = conn.cursor()
+    escritos = 0
+    try:
+        if completo:
+            cursor.execute("DELETE FROM libros_recomendados")
+
+        pendientes = []
+        for libro_id, ids, cuentas in vecinos:
+            pendientes.append((libro_id, ids, cuentas))
+            if len(pendientes) >= LIBROS_POR_ESCRITURA:
+                escritos += _escribir_lote(cursor, pendientes, completo, base)
+                pendientes = []
+        if pendientes:
+            escritos += _escribir_lote(cursor, pendientes, completo, base)
+
+        conn.commit()
+    except ERRORES_BD:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return escritos
+
+
+def _escribir_lote(cursor, pendientes, completo, base=0):
+    """Sustituir los vecinos de un lote de libros"""
+    if not completo:
+        marcadores = ', '.join(['%s'] * len(pendientes))
+        cursor.execute(
+            f"DELETE FROM libros_recomendados WHERE libro_id IN ({marcadores})",
+            [libro_id + base for libro_id, _, _ in pendientes]
+        )
+
+    filas = [
+        (libro_id + base, posicion, int(vecino) + base, int(cuenta))
+        for libro_id, ids, cuentas in pendientes
+        for posicion, (vecino, cuenta) in enumerate(zip(ids, cuentas), start=1)
+    ]
+    if filas:
+        cursor.executemany(
+            "INSERT INTO libros_recomendados (libro_id, posicion, recomendado_id, coincidencias) "
+            "VALUES (%s, %s, %s, %s)",
+            filas
+        )
+    return len(pendientes)
+
+
+def cargar_matriz(ruta=RUTA_MATRIZ):
+    """Retorna `(matriz, ultimo_prestamo_id)` guardados, o None si no existen"""
+    if not os.path.exists(ruta):
+        return None
+    with np.load(ruta) as datos:
+        matriz = sparse.csr_matrix(
+            (datos['data'], datos['indices'], datos['indptr']),
+            shape=tuple(datos['shape'])
+        )
+        return matriz, int(datos['ultimo_prestamo_id'])
+
+
+def guardar_matriz(matriz, ultimo_prestamo_id, ruta=RUTA_MATRIZ):
+    """Guardar la matriz de forma atómica (archivo temporal + reemplazo)"""
+    temporal = ruta + '.tmp'
+    with open(temporal, 'wb') as f:
+        np.savez_compressed(f, data=matriz.data, indices=matriz.indices,
+                            indptr=matriz.indptr, shape=np.array(matriz.shape),
+                            ultimo_prestamo_id=ultimo_prestamo_id)
+    os.replace(temporal, ruta)
+
+
+def _limites(conn, base=0):
+    """Último id de préstamo y mayor id de libro (desplazado) en la base de datos"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM prestamos")
+    ultimo_prestamo_id = cursor.fetchone()[0]
+    cursor.execute("SELECT COALESCE(MAX(id), %s) FROM libros WHERE id >= %s", (base, base))
+    n_libros = cursor.fetchone()[0] - base + 1
+    cursor.close()
+    return ultimo_prestamo_id, n_libros
+
+
+def reconstruir(conn, k=VECINOS_POR_LIBRO, ruta=RUTA_MATRIZ, base=0):
+    """Calcular la matriz y todas las recomendaciones desde cero"""
+    ultimo_prestamo_id, n_libros = _limites(conn, base)
+    _, usuarios, libros = leer_pares(
+        conn,
+        "SELECT id, usuario_id, libro_id FROM prestamos WHERE id <= %s AND libro_id >= %s",
+        (ultimo_prestamo_id, base),
+        base
+    )
+    matriz = coocurrencias(usuarios, libros, n_libros)
+
+    con_vecinos = np.flatnonzero(np.diff(matriz.indptr))
+    escritos = guardar_vecinos(conn, vecinos_principales(matriz, con_vecinos, k), completo=True, base=base)
+    guardar_matriz(matriz, ultimo_prestamo_id, ruta)
+    return escritos
+
+
+def actualizar(conn, k=VECINOS_POR_LIBRO, ruta=RUTA_MATRIZ, base=0):
+    """
+    Incorporar los préstamos posteriores a la última ejecución. Solo se
+    leen los historiales de los usuarios con préstamos nuevos y solo se
+    reescriben los libros cuya fila de la matriz ha cambiado.
+    """
+    guardado = cargar_matriz(ruta)
+    if guardado is None:
+        return reconstruir(conn, k, ruta, base)
+    matriz, desde = guardado
+
+    hasta, n_libros = _limites(conn, base)
+    if hasta <= desde:
+        return 0
+
+    ids, usuarios, libros = leer_pares(
+        conn,
+        """
+        SELECT id, usuario_id, libro_id FROM prestamos
+        WHERE id <= %s AND libro_id >= %s AND usuario_id IN (
+            SELECT usuario_id FROM prestamos WHERE id > %s AND id <= %s
+        )
+        """,
+        (hasta, base, desde, hasta),
+        base
+    )
+    n_libros = max(n_libros, matriz.shape[0])
+    anteriores = ids <= desde
+
+    # Aportación de esos usuarios antes y después de los préstamos nuevos
+    diferencia = (coocurrencias(usuarios, libros, n_libros)
+                  - coocurrencias(usuarios[anteriores], libros[anteriores], n_libros))
+    diferencia.eliminate_zeros()
+
+    matriz.resize((n_libros, n_libros))
+    matriz = (matriz + diferencia).tocsr()
+
+    afectados = np.flatnonzero(np.diff(diferencia.tocsr().indptr))
+    escritos = guardar_vecinos(conn, vecinos_principales(matriz, afectados, k), base=base)
+    guardar_matriz(matriz, hasta, ruta)
+    return escritos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--completo', action='store_true',
+                        help='reconstruir la matriz ignorando la ejecución anterior')
+    parser.add_argument('-k', type=int, default=VECINOS_POR_LIBRO,
+                        help='vecinos guardados por libro')
+    parser.add_argument('--nodo', default=nodo_principal().nombre,
+                        help='nodo de sucursales a procesar (por defecto, el principal)')
+    args = parser.parse_args()
+
+    nodo = next((nodo for nodo in listar_nodos() if nodo.nombre == args.nodo), None)
+    if nodo is None:
+        print(f"❌ Nodo desconocido: {args.nodo}")
+        sys.exit(1)
+
+    conn = get_db_connection(nodo)
+    if not conn:
+        print("❌ No se pudo conectar a la base de datos")
+        sys.exit(1)
+
+    base = nodo.bloque * RANGO_IDS
+    ruta = ruta_matriz(nodo)
+    inicio = time.perf_counter()
+    try:
+        if args.completo:
+            escritos = reconstruir(conn, args.k, ruta, base)
+        else:
+            escritos = actualizar(conn, args.k, ruta, base)
+    finally:
+        conn.close()
+
+    print(f"✅ Recomendaciones actualizadas para {escritos} libros "
+          f"en {time.perf_counter() - inicio:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
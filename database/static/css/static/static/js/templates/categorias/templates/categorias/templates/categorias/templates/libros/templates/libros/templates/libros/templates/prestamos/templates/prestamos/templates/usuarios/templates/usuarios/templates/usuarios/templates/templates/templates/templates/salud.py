@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Comprobaciones de salud para el Sistema de Gestión de Biblioteca
+
+Sustituyen a `verificar_sistema.py` para el orquestador, que solo necesita
+saber si el proceso vive y si puede atender peticiones:
+
+* `/healthz`: el proceso responde; no toca la base de datos.
+* `/readyz`: abre una conexión como lo hacen las rutas y ejecuta
+  `SELECT 1`. El resultado se reutiliza durante TTL_LISTO segundos, de modo
+  que sondeos frecuentes de varios orquestadores no cargan la base.
+* `/readyz?profundo=1` (solo administradores): añade la comprobación profunda (tablas requeridas
+  y filas estimadas con estadísticas, sin COUNT(*)) de cada nodo de
+  sucursales, en paralelo. Se ejecuta en segundo plano como mucho una vez
+  cada TTL_PROFUNDO segundos; la respuesta trae el último resultado
+  disponible sin esperarla.
+
+La disponibilidad (`/readyz`) solo depende del nodo principal: con un nodo
+secundario caído la aplicación sigue atendiendo las demás sucursales.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from db import ERRORES_BD, estimar_filas
+from sucursales import dispersar
+
+TTL_LISTO = 2.0  # segundos
+TTL_PROFUNDO = 60.0  # segundos
+TABLAS_REQUERIDAS = ('usuarios', 'categorias', 'libros', 'prestamos')
+
+_conectar = None
+
+
+def configurar_salud(conectar):
+    """Indicar la función que abre conexiones para las comprobaciones"""
+    global _conectar
+    _conectar = conectar
+
+
+def comprobar_conexion():
+    """Abrir una conexión y ejecutar SELECT 1"""
+    inicio = time.perf_counter()
+    try:
+        conn = _conectar()
+        if not conn:
+            return {'listo': False, 'error': 'No se pudo conectar a la base de datos'}
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+    except ERRORES_BD as e:
+        return {'listo': False, 'error': str(e)}
+    return {'listo': True, 'bd_ms': round((time.perf_counter() - inicio) * 1000, 2)}
+
+
+def _comprobar_nodo(conn, nodo):
+    """Tablas requeridas y filas estimadas por tabla en un nodo"""
+    filas = estimar_filas(conn)
+    faltantes = [tabla for tabla in TABLAS_REQUERIDAS if tabla not in filas]
+    return nodo.nombre, {
+        'estado': 'error' if faltantes else 'ok',
+        'tablas_faltantes': faltantes,
+        'filas_estimadas': filas
+    }
+
+
+def comprobacion_profunda():
+    """Comprobación de tablas de todos los nodos, en paralelo"""
+    inicio = time.perf_counter()
+    resultados, fallidos = dispersar(_comprobar_nodo)
+    nodos = dict(resultados)
+    nodos.update({nombre: {'estado': 'error', 'error': error} for nombre, error in fallidos.items()})
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'estado': 'ok' if all(nodo['estado'] == 'ok' for nodo in nodos.values()) else 'error',
+        'nodos': nodos,
+        'duracion_ms': round((time.perf_counter() - inicio) * 1000, 2)
+    }
+
+
+class ComprobacionCacheada:
+    """
+    Resultado de una comprobación reutilizado durante `ttl` segundos. Solo
+    un hilo la repite al caducar; los demás reciben el resultado anterior.
+    """
+
+    def __init__(self, comprobar, ttl):
+        self._comprobar = comprobar
+        self.ttl = ttl
+        self._resultado = None
+        self._instante = 0.0
+        self._lock = threading.Lock()
+
+    def _vigente(self):
+        return self._resultado is not None and time.monotonic() - self._instante < self.ttl
+
+    def obtener(self):
+        """Retorna `(resultado, cacheado)`"""
+        if self._vigente():
+            return self._resultado, True
+        # Sin resultado previo hay que esperar; si no, no bloquear
+        if not self._lock.acquire(blocking=self._resultado is None):
+            return self._resultado, True
+        try:
+            if self._vigente():
+                return self._resultado, True
+            self._resultado = self._comprobar()
+            self._instante = time.monotonic()
+            return self._resultado, False
+        finally:
+            self._lock.release()
+
+
+class ComprobacionEnSegundoPlano:
+    """Comprobación costosa que se refresca en un hilo aparte al caducar"""
+
+    def __init__(self, comprobar, ttl):
+        self._comprobar = comprobar
+        self.ttl = ttl
+        self._resultado = {'estado': 'pendiente'}
+        self._instante = None
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    def _ejecutar(self):
+        resultado = self._comprobar()
+        with self._lock:
+            self._resultado = resultado
+            self._instante = time.monotonic()
+            self._hilo = None
+
+    def obtener(self):
+        """Último resultado disponible; lanza una nueva comprobación si caducó"""
+        with self._lock:
+            caducado = self._instante is None or time.monotonic() - self._instante >= self.ttl
+            if caducado and self._hilo is None:
+                self._hilo = threading.Thread(target=self._ejecutar, name='salud', daemon=True)
+                self._hilo.start()
+            return dict(self._resultado, en_curso=self._hilo is not None)
+
+
+_listo = ComprobacionCacheada(comprobar_conexion, TTL_LISTO)
+_profundo = ComprobacionEnSegundoPlano(comprobacion_profunda, TTL_PROFUNDO)
+
+
+def estado_listo():
+    """Resultado (posiblemente cacheado) de la comprobación de conexión"""
+    resultado, cacheado = _listo.obtener()
+    return dict(resultado, cacheado=cacheado)
+
+
+def estado_profundo():
+    """Último resultado de la comprobación profunda"""
+    return _profundo.obtener()
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reparto de sucursales entre nodos de base de datos
+
+Con una sola `biblioteca_db` todas las sucursales comparten un servidor y
+un único contador `libros.cantidad_disponible` por título. Este módulo
+reparte el inventario y la circulación por sucursal:
+
+* `libros` y `prestamos` llevan la columna `sucursal_id`. Las filas de una
+  sucursal, junto con sus `reservas` y `notificaciones`, viven en el nodo
+  asignado a esa sucursal: altas de libros, préstamos, devoluciones y
+  reservas usan una sola conexión a ese nodo y conservan sus transacciones
+  y el orden de bloqueo.
+* `usuarios` y `categorias` son tablas de referencia. El nodo principal
+  (bloque 0) es el maestro y cada cambio se copia al resto de nodos, para
+  que las claves foráneas y los JOIN locales sigan funcionando.
+* Cada nodo asigna ids en su propio bloque de RANGO_IDS valores, de modo
+  que el id de un libro, préstamo o reserva indica su nodo y las URL no
+  cambian.
+* Las lecturas de varias sucursales (catálogo, préstamos, panel, reportes)
+  se lanzan en paralelo en todos los nodos con `dispersar` y se combinan
+  en la aplicación.
+
+El mapa se lee del archivo JSON indicado en `SUCURSALES_CONFIG`:
+
+    {
+      "nodos": {
+        "principal": {"bloque": 0},
+        "norte": {"bloque": 1, "host": "10.0.0.12"}
+      },
+      "sucursales": {
+        "1": {"nombre": "Central", "nodo": "principal"},
+        "2": {"nombre": "Norte", "nodo": "norte"}
+      }
+    }
+
+Los parámetros de cada nodo se combinan con `DB_CONFIG`; con
+`DB_BACKEND=sqlite` cada nodo indica su archivo con `sqlite_path`. Sin
+archivo hay un único nodo con la sucursal 1, como antes del reparto.
+
+Un nodo nuevo se prepara (copia de las tablas de referencia y contadores
+de ids en su bloque) antes de asignarle sucursales:
+
+    python sucursales.py              # preparar todos los nodos secundarios
+    python sucursales.py norte        # preparar solo el nodo indicado
+    python sucursales.py --purgar     # borrar además las filas de otras sucursales
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as TiempoAgotado
+
+from flask import g, has_request_context
+
+from db import BACKEND, ERRORES_BD, NodoNoDisponible
+from perfilador import consultas_en_curso, perfilar_conexion
+
+RUTA_CONFIG = os.environ.get('SUCURSALES_CONFIG')
+RANGO_IDS = 100_000_000  # ids por nodo; con INT de MySQL caben 21 bloques
+MAX_BLOQUES = 21
+TABLAS_REFERENCIA = ('usuarios', 'categorias')
+TABLAS_LOCALES = ('libros', 'prestamos', 'reservas', 'notificaciones')
+TIEMPO_MAXIMO = 10.0  # segundos de espera a los nodos en una lectura dispersa
+MAX_HILOS = 16
+
+Nodo = namedtuple('Nodo', 'nombre bloque config sucursales')
+
+_nodos = []  # ordenados por bloque; el primero es el principal
+_por_nombre = {}
+_por_bloque = {}
+_sucursales = {}  # id -> {'nombre': ..., 'nodo': ...}
+_conectar = None
+_ejecutor = ThreadPoolExecutor(max_workers=MAX_HILOS, thread_name_prefix='dispersion')
+_logger = logging.getLogger(__name__)
+
+
+def cargar_mapa(db_config, ruta=None):
+    """Leer y validar el mapa de nodos y sucursales; retorna `(nodos, sucursales)`"""
+    if not ruta:
+        return [Nodo('principal', 0, dict(db_config), (1,))], {1: {'nombre': 'Central', 'nodo': 'principal'}}
+
+    with open(ruta, encoding='utf-8') as f:
+        datos = json.load(f)
+
+    sucursales = {int(id): dict(sucursal) for id, sucursal in datos['sucursales'].items()}
+    nodos = []
+    for nombre, parametros in datos['nodos'].items():
+        parametros = dict(parametros)
+        bloque = int(parametros.pop('bloque'))
+        propias = tuple(sorted(id for id, sucursal in sucursales.items() if sucursal['nodo'] == nombre))
+        nodos.append(Nodo(nombre, bloque, dict(db_config, **parametros), propias))
+    nodos.sort(key=lambda nodo: nodo.bloque)
+
+    bloques = [nodo.bloque for nodo in nodos]
+    if not nodos or bloques[0] != 0 or len(set(bloques)) != len(bloques) or bloques[-1] >= MAX_BLOQUES:
+        raise ValueError(f'Los nodos deben tener bloques distintos entre 0 y {MAX_BLOQUES - 1}, '
+                         'y el principal el bloque 0')
+    desconocidos = {sucursal['nodo'] for sucursal in sucursales.values()} - {nodo.nombre for nodo in nodos}
+    if desconocidos:
+        raise ValueError(f"Sucursales asignadas a nodos inexistentes: {', '.join(sorted(desconocidos))}")
+    return nodos, sucursales
+
+
+def configurar_sucursales(db_config, conectar, ruta=RUTA_CONFIG):
+    """Cargar el mapa de sucursales e indicar la función `conectar(nodo)`"""
+    global _nodos, _sucursales, _conectar, _por_nombre, _por_bloque
+    _nodos, _sucursales = cargar_mapa(db_config, ruta)
+    _por_nombre = {nodo.nombre: nodo for nodo in _nodos}
+    _por_bloque = {nodo.bloque: nodo for nodo in _nodos}
+    _conectar = conectar
+
+
+def nodo_principal():
+    """Nodo con las tablas globales y la copia maestra de las de referencia"""
+    return _nodos[0]
+
+
+def listar_nodos():
+    return list(_nodos)
+
+
+def nombres_sucursales():
+    """Diccionario `{sucursal_id: nombre}` ordenado por id"""
+    return {id: sucursal['nombre'] for id, sucursal in sorted(_sucursales.items())}
+
+
+def sucursal_por_defecto():
+    """Sucursal de menor id, para formularios sin sucursal elegida"""
+    return min(_sucursales)
+
+
+def nodo_de_sucursal(sucursal_id):
+    """Nodo que guarda la sucursal, o None si la sucursal no existe"""
+    sucursal = _sucursales.get(sucursal_id)
+    return _por_nombre[sucursal['nodo']] if sucursal else None
+
+
+def nodo_de_id(id):
+    """Nodo que guarda la fila `id` de una tabla local (según su bloque de ids), o None"""
+    try:
+        return _por_bloque.get(int(id) // RANGO_IDS)
+    except (TypeError, ValueError):
+        return None
+
+
+def filtro_sucursales(columna, sucursales):
+    """Condición `columna IN (...)` y sus parámetros"""
+    if not sucursales:
+        return '1 = 0', ()
+    return f"{columna} IN ({', '.join(['%s'] * len(sucursales))})", tuple(sucursales)
+
+
+def en_sucursales(consulta, columna, nodo):
+    """Consulta con `{filtro}` limitada a las sucursales del nodo, y sus parámetros"""
+    filtro, params = filtro_sucursales(columna, nodo.sucursales)
+    return consulta.format(filtro=filtro), params * consulta.count('{filtro}')
+
+
+def conectar_nodo(nodo):
+    """Abrir una conexión con el nodo; lanza NodoNoDisponible si falla"""
+    conn = _conectar(nodo)
+    if not conn:
+        raise NodoNoDisponible(f'No se pudo conectar con el nodo {nodo.nombre}')
+    return conn
+
+
+def _en_nodo(consulta, nodo, consultas_perfil=None):
+    conn = conectar_nodo(nodo)
+    if consultas_perfil is not None:
+        # Hilo del pool: sin contexto de petición, el perfil llega como argumento
+        conn = perfilar_conexion(conn, consultas_perfil)
+    try:
+        return consulta(conn, nodo)
+    finally:
+        conn.close()
+
+
+def dispersar(consulta, nodos=None):
+    """
+    Ejecutar `consulta(conn, nodo)` en paralelo en cada nodo (todos por
+    defecto). Retorna `(resultados, fallidos)`: los resultados de los nodos
+    que respondieron, en orden de bloque, y `{nombre: error}` de los que
+    fallaron o no respondieron en TIEMPO_MAXIMO segundos.
+    """
+    nodos = _nodos if nodos is None else nodos
+    resultados = []
+    fallidos = {}
+
+    if len(nodos) == 1:
+        # Un solo nodo: sin pasar por el pool de hilos
+        try:
+            resultados.append(_en_nodo(consulta, nodos[0]))
+        except ERRORES_BD as e:
+            fallidos[nodos[0].nombre] = str(e)
+    else:
+        consultas_perfil = consultas_en_curso()
+        futuros = [(nodo, _ejecutor.submit(_en_nodo, consulta, nodo, consultas_perfil)) for nodo in nodos]
+        limite = time.monotonic() + TIEMPO_MAXIMO
+        for nodo, futuro in futuros:
+            try:
+                resultados.append(futuro.result(timeout=max(0, limite - time.monotonic())))
+            except TiempoAgotado:
+                fallidos[nodo.nombre] = 'sin respuesta'
+            except ERRORES_BD as e:
+                fallidos[nodo.nombre] = str(e)
+
+    if fallidos:
+        _logger.warning("Nodos sin responder: %s", fallidos)
+        if has_request_context():
+            # Resultado parcial: que no se guarde como respuesta válida
+            g.db_error = True
+    return resultados, fallidos
+
+
+def _leer_filas(conn, tabla, id=None):
+    cursor = conn.cursor(dictionary=True)
+    if id is None:
+        cursor.execute(f"SELECT * FROM {tabla} ORDER BY id")
+    else:
+        cursor.execute(f"SELECT * FROM {tabla} WHERE id = %s", (id,))
+    filas = cursor.fetchall()
+    cursor.close()
+    return filas
+
+
+def _copiar_filas(conn, tabla, filas):
+    """Insertar o actualizar las filas, conservando su id, en la tabla del nodo"""
+    if not filas:
+        return 0
+    columnas = [columna for columna in filas[0] if columna != 'id']
+    actualizar = f"UPDATE {tabla} SET {', '.join(f'{c} = %s' for c in columnas)} WHERE id = %s"
+    insertar = (f"INSERT INTO {tabla} (id, {', '.join(columnas)}) "
+                f"VALUES ({', '.join(['%s'] * (len(columnas) + 1))})")
+
+    cursor = conn.cursor()
+    try:
+        for fila in filas:
+            valores = [fila[columna] for columna in columnas]
+            cursor.execute(f"SELECT id FROM {tabla} WHERE id = %s", (fila['id'],))
+            if cursor.fetchall():
+                cursor.execute(actualizar, valores + [fila['id']])
+            else:
+                cursor.execute(insertar, [fila['id']] + valores)
+        conn.commit()
+    except ERRORES_BD:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return len(filas)
+
+
+def replicar_fila(conn, tabla, id):
+    """
+    Copiar la fila `id` de una tabla de referencia, recién creada o
+    modificada en el nodo principal (`conn`), al resto de nodos. Retorna
+    `{nombre: error}` de los nodos que no la recibieron.
+    """
+    secundarios = _nodos[1:]
+    if not secundarios:
+        return {}
+    filas = _leer_filas(conn, tabla, id)
+    _, fallidos = dispersar(lambda conn_nodo, nodo: _copiar_filas(conn_nodo, tabla, filas), secundarios)
+    return fallidos
+
+
+def eliminar_replicada(tabla, id):
+    """
+    Borrar una fila de una tabla de referencia en todos los nodos. El DELETE
+    se ejecuta en cada nodo sin confirmar y solo se confirma si ninguno lo
+    rechaza (p. ej. un usuario con préstamos en alguna sucursal); si no, se
+    deshace en todos y se propaga el error.
+    """
+    conexiones = []
+    try:
+        for nodo in _nodos:
+            conn = conectar_nodo(nodo)
+            conexiones.append(conn)
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"DELETE FROM {tabla} WHERE id = %s", (id,))
+            finally:
+                cursor.close()
+        for conn in conexiones:
+            conn.commit()
+    except ERRORES_BD:
+        for conn in conexiones:
+            conn.rollback()
+        raise
+    finally:
+        for conn in conexiones:
+            conn.close()
+
+
+def _filas_ajenas(conn, nodo, purgar):
+    """Contar (y con `purgar`, borrar) las filas de sucursales de otros nodos"""
+    filtro, params = filtro_sucursales('sucursal_id', nodo.sucursales)
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM libros WHERE NOT ({filtro})", params)
+    libros = cursor.fetchone()[0]
+    cursor.execute(f"SELECT COUNT(*) FROM prestamos WHERE NOT ({filtro})", params)
+    prestamos = cursor.fetchone()[0]
+    if purgar and (libros or prestamos):
+        # prestamos primero (RESTRICT); las reservas se borran en cascada con su libro
+        cursor.execute(f"DELETE FROM prestamos WHERE NOT ({filtro})", params)
+        cursor.execute(f"DELETE FROM libros WHERE NOT ({filtro})", params)
+        conn.commit()
+    cursor.close()
+    return libros, prestamos
+
+
+def _mover_contador(conn, tabla, base):
+    """Hacer que los próximos ids de la tabla empiecen en `base` (si aún no lo hacen)"""
+    cursor = conn.cursor()
+    if BACKEND == 'sqlite':
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = %s", (tabla,))
+        fila = cursor.fetchone()
+        if fila is None:
+            cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", (tabla, base - 1))
+        elif fila[0] < base - 1:
+            cursor.execute("UPDATE sqlite_sequence SET seq = %s WHERE name = %s", (base - 1, tabla))
+        conn.commit()
+    else:
+        # MySQL no baja el contador por debajo del mayor id existente
+        cursor.execute(f"ALTER TABLE {tabla} AUTO_INCREMENT = {int(base)}")
+    cursor.close()
+
+
+def preparar_nodo(nodo, purgar=False):
+    """
+    Dejar listo un nodo secundario: copiar las tablas de referencia desde el
+    principal y mover los contadores de ids de las tablas locales a su
+    bloque. Con `purgar` se borran las filas de sucursales que no le
+    corresponden (p. ej. los datos de ejemplo del esquema). Retorna un
+    resumen con las filas copiadas y las ajenas encontradas.
+    """
+    referencia = {
+        tabla: _en_nodo(lambda conn, principal: _leer_filas(conn, tabla), nodo_principal())
+        for tabla in TABLAS_REFERENCIA
+    }
+
+    conn = conectar_nodo(nodo)
+    try:
+        libros, prestamos = _filas_ajenas(conn, nodo, purgar)
+        resumen = {'libros_ajenos': libros, 'prestamos_ajenos': prestamos, 'purgados': purgar}
+        for tabla in TABLAS_REFERENCIA:
+            resumen[tabla] = _copiar_filas(conn, tabla, referencia[tabla])
+        for tabla in TABLAS_LOCALES:
+            _mover_contador(conn, tabla, nodo.bloque * RANGO_IDS)
+    finally:
+        conn.close()
+    return resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('nodos', nargs='*',
+                        help='nodos a preparar (por defecto, todos los secundarios)')
+    parser.add_argument('--purgar', action='store_true',
+                        help='borrar de cada nodo los libros y préstamos de sucursales ajenas')
+    args = parser.parse_args()
+
+    from app import DB_CONFIG, get_db_connection
+    configurar_sucursales(DB_CONFIG, get_db_connection)
+
+    nodos = [nodo for nodo in _nodos[1:] if not args.nodos or nodo.nombre in args.nodos]
+    if not nodos:
+        print("❌ No hay nodos secundarios que preparar (revisa SUCURSALES_CONFIG)")
+        sys.exit(1)
+
+    errores = 0
+    for nodo in nodos:
+        try:
+            resumen = preparar_nodo(nodo, args.purgar)
+        except ERRORES_BD as e:
+            errores += 1
+            print(f"❌ {nodo.nombre}: {e}")
+            continue
+        print(f"✅ {nodo.nombre}: {resumen['usuarios']} usuarios y {resumen['categorias']} categorías copiados, "
+              f"ids desde {nodo.bloque * RANGO_IDS}")
+        if resumen['libros_ajenos'] or resumen['prestamos_ajenos']:
+            accion = 'borrados' if resumen['purgados'] else 'encontrados (usa --purgar para borrarlos)'
+            print(f"   ⚠️  {resumen['libros_ajenos']} libros y {resumen['prestamos_ajenos']} préstamos "
+                  f"de otras sucursales {accion}")
+    sys.exit(1 if errores else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Configuración común de las pruebas: la aplicación arranca sobre SQLite en
+memoria con los datos de ejemplo del esquema, sin MySQL ni archivos.
+"""
+
+import os
+import sys
+
+os.environ['DB_BACKEND'] = 'sqlite'
+os.environ['SQLITE_PATH'] = ':memory:'
+# Las pruebas usan la ruta del esquema y el mapa de sucursales por defecto
+os.environ.pop('SQLITE_SCHEMA', None)
+os.environ.pop('SUCURSALES_CONFIG', None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from jinja2 import ChoiceLoader, FileSystemLoader  # noqa: E402
+
+import app as aplicacion  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    aplicacion.app.config['TESTING'] = True
+    return aplicacion.app
+
+
+@pytest.fixture
+def cliente(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin(cliente):
+    """Cliente con la sesión del administrador de los datos de ejemplo"""
+    with cliente.session_transaction() as sesion:
+        sesion['user_id'] = 1
+        sesion['user_name'] = 'Administrador Principal'
+        sesion['user_role'] = 'admin'
+    return cliente
+
+
+@pytest.fixture
+def plantillas(app, monkeypatch):
+    """
+    Cargar además las plantillas de las carpetas `templates` de los
+    directorios superiores, donde el repositorio guarda las de cada sección.
+    """
+    carpetas = []
+    ruta = app.root_path
+    while True:
+        carpeta = os.path.join(ruta, 'templates')
+        if os.path.isdir(carpeta):
+            carpetas.append(carpeta)
+        if os.path.isdir(os.path.join(ruta, '.git')) or os.path.dirname(ruta) == ruta:
+            break
+        ruta = os.path.dirname(ruta)
+
+    monkeypatch.setattr(app, 'jinja_loader', ChoiceLoader([FileSystemLoader(c) for c in carpetas]))
+    app.jinja_env.cache.clear()
+    yield
+    app.jinja_env.cache.clear()
+
+
+@pytest.fixture
+def conexiones_cerradas(monkeypatch):
+    """Lista que recibe un elemento por cada conexión de la aplicación cerrada"""
+    cerradas = []
+    conectar = aplicacion.get_db_connection
+
+    def conectar_rastreada(*args, **kwargs):
+        conn = conectar(*args, **kwargs)
+        cerrar = conn.close
+
+        def close():
+            cerradas.append(conn)
+            cerrar()
+        conn.close = close
+        return conn
+
+    monkeypatch.setattr(aplicacion, 'get_db_connection', conectar_rastreada)
+    return cerradas
+
+
+@pytest.fixture
+def en_streaming(monkeypatch, plantillas):
+    """Enviar en streaming cualquier listado, por pequeño que sea"""
+    monkeypatch.setattr(aplicacion, 'UMBRAL_STREAMING', 0)
+    aplicacion.cache_fragmentos.limpiar()
+    yield
+    aplicacion.cache_fragmentos.limpiar()
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Control de admisión en respuestas en streaming"""
+
+from flask import Flask, stream_with_context
+
+from admision import _compuertas, admision
+
+
+def crear_app_streaming():
+    app = Flask(__name__)
+
+    @app.route('/listado', methods=['GET', 'HEAD'])
+    @admision(max_concurrentes=1, max_en_cola=0)
+    def listado_en_streaming():
+        def generar():
+            yield 'fila 1\n'
+            yield 'fila 2\n'
+        return stream_with_context(generar())
+
+    return app
+
+
+def activas():
+    return _compuertas['listado_en_streaming'].estado()['activas']
+
+
+def test_get_en_streaming_libera_la_compuerta():
+    cliente = crear_app_streaming().test_client()
+    respuesta = cliente.get('/listado')
+    assert respuesta.get_data(as_text=True) == 'fila 1\nfila 2\n'
+    respuesta.close()
+    assert activas() == 0
+
+
+def test_head_en_streaming_libera_la_compuerta():
+    cliente = crear_app_streaming().test_client()
+    for _ in range(4):
+        respuesta = cliente.head('/listado')
+        assert respuesta.status_code == 200
+        respuesta.close()
+    assert activas() == 0
+
+    # Con la compuerta de un solo hueco, un GET posterior sigue entrando
+    respuesta = cliente.get('/listado')
+    assert respuesta.status_code == 200
+    respuesta.close()
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""Exportación del registro de auditoría en streaming"""
+
+
+def test_get_auditoria_cierra_la_conexion(admin, conexiones_cerradas):
+    respuesta = admin.get('/auditoria')
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'application/x-ndjson'
+    respuesta.get_data()
+    respuesta.close()
+    assert len(conexiones_cerradas) == 1
+
+
+def test_head_auditoria_cierra_la_conexion(admin, conexiones_cerradas):
+    respuesta = admin.head('/auditoria')
+    assert respuesta.status_code == 200
+    respuesta.close()
+    assert len(conexiones_cerradas) == 1
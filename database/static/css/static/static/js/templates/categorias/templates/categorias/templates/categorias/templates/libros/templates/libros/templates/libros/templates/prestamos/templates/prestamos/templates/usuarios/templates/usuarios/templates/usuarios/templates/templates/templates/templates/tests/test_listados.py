@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Listados de libros y préstamos en streaming"""
+
+import pytest
+
+from admision import _compuertas
+from cache_fragmentos import CacheFragmentos, cache_fragmentos
+
+
+@pytest.mark.parametrize('ruta', ['/libros', '/prestamos'])
+def test_get_en_streaming_cierra_la_conexion(admin, en_streaming, conexiones_cerradas, ruta):
+    respuesta = admin.get(ruta)
+    assert respuesta.status_code == 200
+    assert 'Content-Length' not in respuesta.headers
+    assert '</html>' in respuesta.get_data(as_text=True)
+    respuesta.close()
+    assert len(conexiones_cerradas) == 1
+
+
+@pytest.mark.parametrize('ruta', ['/libros', '/prestamos'])
+def test_head_en_streaming_cierra_la_conexion(admin, en_streaming, conexiones_cerradas, ruta):
+    for _ in range(4):
+        respuesta = admin.head(ruta)
+        assert respuesta.status_code == 200
+        respuesta.close()
+    assert len(conexiones_cerradas) == 4
+    assert _compuertas[ruta.strip('/')].estado()['activas'] == 0
+
+
+def test_get_cortado_antes_del_primer_trozo_cierra_la_conexion(admin, en_streaming, conexiones_cerradas):
+    respuesta = admin.get('/libros', buffered=False)
+    assert respuesta.status_code == 200
+    respuesta.close()
+    assert len(conexiones_cerradas) == 1
+
+
+@pytest.mark.parametrize('ruta', ['/libros', '/prestamos'])
+def test_listado_en_streaming_completo_queda_en_cache(admin, en_streaming, ruta):
+    respuesta = admin.get(ruta)
+    assert 'Content-Length' not in respuesta.headers
+    html = respuesta.get_data(as_text=True)
+    respuesta.close()
+    assert cache_fragmentos.estadisticas()['entradas'] == 1
+
+    # La siguiente petición usa el fragmento sin consultar ni renderizar la tabla
+    respuesta = admin.get(ruta)
+    assert 'Content-Length' in respuesta.headers
+    assert respuesta.get_data(as_text=True).split() == html.split()
+
+
+def test_listado_en_streaming_cortado_no_queda_en_cache(admin, en_streaming):
+    respuesta = admin.head('/libros')
+    respuesta.close()
+    respuesta = admin.get('/libros', buffered=False)
+    next(respuesta.response)
+    respuesta.close()
+    assert cache_fragmentos.estadisticas()['entradas'] == 0
+
+
+def test_fragmento_en_streaming_grande_no_se_guarda():
+    cache = CacheFragmentos(maximo_streaming=10)
+    assert ''.join(cache.guardar_al_terminar('pequeno', ['<tr>', '</tr>'])) == '<tr></tr>'
+    assert ''.join(cache.guardar_al_terminar('grande', ['<tr>', 'x' * 10, '</tr>'])) == '<tr>' + 'x' * 10 + '</tr>'
+    assert cache.obtener('pequeno') == '<tr></tr>'
+    assert cache.obtener('grande') is None
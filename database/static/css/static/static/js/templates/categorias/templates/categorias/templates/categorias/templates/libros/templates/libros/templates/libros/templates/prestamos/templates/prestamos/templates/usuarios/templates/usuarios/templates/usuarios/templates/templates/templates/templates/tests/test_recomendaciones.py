@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""Recomendaciones por co-préstamo en la ficha del libro"""
+
+import pytest
+
+import app as aplicacion
+
+
+@pytest.fixture
+def vecinos():
+    """Vecinos precalculados del libro 1: '1984' y 'Fahrenheit 451'"""
+    conn = aplicacion.get_db_connection()
+    cursor = conn.cursor()
+    cursor.executemany(
+        "INSERT INTO libros_recomendados (libro_id, posicion, recomendado_id, coincidencias) VALUES (%s, %s, %s, %s)",
+        [(1, 1, 2, 5), (1, 2, 4, 2)]
+    )
+    conn.commit()
+    yield
+    cursor.execute("DELETE FROM libros_recomendados WHERE libro_id = 1")
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def test_editar_libro_muestra_los_vecinos(admin, plantillas, vecinos):
+    respuesta = admin.get('/libros/1/editar')
+    assert respuesta.status_code == 200
+    html = respuesta.get_data(as_text=True)
+    assert 'Quienes prestaron este libro también prestaron' in html
+    assert html.index('1984') < html.index('Fahrenheit 451')
+    assert '/libros/2/editar' in html
+
+
+def test_editar_libro_sin_vecinos(admin, plantillas):
+    respuesta = admin.get('/libros/1/editar')
+    assert respuesta.status_code == 200
+    assert 'Quienes prestaron este libro también prestaron' not in respuesta.get_data(as_text=True)
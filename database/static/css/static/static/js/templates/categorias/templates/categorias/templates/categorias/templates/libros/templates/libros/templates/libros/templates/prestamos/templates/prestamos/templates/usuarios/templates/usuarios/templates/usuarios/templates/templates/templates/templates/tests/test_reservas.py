@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""La cola de reservas tiene prioridad sobre cualquier ejemplar disponible"""
+
+import pytest
+
+import app as aplicacion
+
+LIBRO = 5  # 'Introducción a los Algoritmos'
+JUAN, ANA, CARLOS = 3, 4, 5
+
+
+def consultar(consulta, params=()):
+    conn = aplicacion.get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(consulta, params)
+    filas = cursor.fetchall() if cursor.description else None
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return filas
+
+
+def estado_reservas():
+    return {fila['usuario_id']: fila['estado'] for fila in consultar(
+        "SELECT usuario_id, estado FROM reservas WHERE libro_id = %s", (LIBRO,)
+    )}
+
+
+def prestatarios():
+    return [fila['usuario_id'] for fila in consultar(
+        "SELECT usuario_id FROM prestamos WHERE libro_id = %s AND fecha_devolucion IS NULL ORDER BY id", (LIBRO,)
+    )]
+
+
+def disponibles():
+    return consultar("SELECT cantidad_disponible FROM libros WHERE id = %s", (LIBRO,))[0]['cantidad_disponible']
+
+
+@pytest.fixture
+def cola():
+    """Libro agotado con Juan y, detrás, Ana esperando; al terminar se deja como estaba"""
+    libro = consultar("SELECT * FROM libros WHERE id = %s", (LIBRO,))[0]
+    ultimo = {tabla: consultar(f"SELECT COALESCE(MAX(id), 0) as id FROM {tabla}")[0]['id']
+              for tabla in ('prestamos', 'reservas', 'notificaciones')}
+    consultar("UPDATE libros SET cantidad_disponible = 0 WHERE id = %s", (LIBRO,))
+    for usuario_id in (JUAN, ANA):
+        consultar("INSERT INTO reservas (usuario_id, libro_id) VALUES (%s, %s)", (usuario_id, LIBRO))
+    yield libro
+    for tabla in ('notificaciones', 'reservas', 'prestamos'):
+        consultar(f"DELETE FROM {tabla} WHERE id > %s", (ultimo[tabla],))
+    consultar("UPDATE libros SET cantidad_disponible = %s WHERE id = %s", (libro['cantidad_disponible'], LIBRO))
+
+
+def editar_cantidad(cliente, libro, cantidad):
+    return cliente.post(f'/libros/{LIBRO}/editar', data={
+        'titulo': libro['titulo'], 'autor': libro['autor'], 'isbn': libro['isbn'],
+        'categoria_id': libro['categoria_id'], 'año_publicacion': libro['año_publicacion'],
+        'editorial': libro['editorial'], 'cantidad_disponible': cantidad
+    })
+
+
+def test_ampliar_existencias_presta_a_la_cabeza_de_la_cola(admin, cola):
+    respuesta = editar_cantidad(admin, cola, 1)
+    assert respuesta.status_code == 302
+    assert prestatarios() == [JUAN]
+    assert estado_reservas() == {JUAN: 'asignada', ANA: 'pendiente'}
+    assert disponibles() == 0
+
+
+def test_ampliar_existencias_atiende_a_toda_la_cola(admin, cola):
+    editar_cantidad(admin, cola, 2)
+    assert prestatarios() == [JUAN, ANA]
+    assert estado_reservas() == {JUAN: 'asignada', ANA: 'asignada'}
+    assert disponibles() == 0
+
+
+def test_prestamo_a_quien_no_espera_se_rechaza(admin, plantillas, cola):
+    consultar("UPDATE libros SET cantidad_disponible = 1 WHERE id = %s", (LIBRO,))
+    respuesta = admin.post('/prestamos/crear', data={'usuario_id': CARLOS, 'libro_id': LIBRO})
+    assert respuesta.status_code == 200
+    assert 'reservas en espera' in respuesta.get_data(as_text=True)
+    assert prestatarios() == []
+    assert disponibles() == 1
+
+
+def test_prestamo_a_la_cabeza_de_la_cola_la_atiende(admin, cola):
+    consultar("UPDATE libros SET cantidad_disponible = 1 WHERE id = %s", (LIBRO,))
+    respuesta = admin.post('/prestamos/crear', data={'usuario_id': JUAN, 'libro_id': LIBRO})
+    assert respuesta.status_code == 302
+    assert prestatarios() == [JUAN]
+    assert estado_reservas() == {JUAN: 'asignada', ANA: 'pendiente'}
+    assert disponibles() == 0
+
+
+def test_devolucion_presta_a_la_cabeza_de_la_cola(admin, cola):
+    consultar(
+        "INSERT INTO prestamos (usuario_id, libro_id, fecha_prestamo, sucursal_id) VALUES (%s, %s, %s, 1)",
+        (CARLOS, LIBRO, '2026-01-10')
+    )
+    prestamo_id = consultar("SELECT MAX(id) as id FROM prestamos")[0]['id']
+    respuesta = admin.post(f'/prestamos/{prestamo_id}/devolver')
+    assert respuesta.status_code == 302
+    assert prestatarios() == [JUAN]
+    assert estado_reservas() == {JUAN: 'asignada', ANA: 'pendiente'}
+    assert disponibles() == 0
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""Comprobaciones de salud"""
+
+
+def test_readyz_sin_sesion_solo_indica_si_esta_listo(cliente):
+    respuesta = cliente.get('/readyz')
+    assert respuesta.status_code == 200
+    assert 'profundo' not in respuesta.get_json()
+
+
+def test_readyz_profundo_requiere_administrador(cliente):
+    respuesta = cliente.get('/readyz?profundo=1')
+    assert respuesta.status_code == 403
+    assert 'profundo' not in respuesta.get_json()
+
+
+def test_readyz_profundo_con_administrador(admin):
+    respuesta = admin.get('/readyz?profundo=1')
+    assert respuesta.status_code == 200
+    assert 'profundo' in respuesta.get_json()
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Arranque de la aplicación sobre SQLite en memoria"""
+
+import os
+import time
+
+import pytest
+
+import db
+
+
+def test_esquema_por_defecto_existe():
+    assert db.SQLITE_SCHEMA and os.path.exists(db.SQLITE_SCHEMA)
+
+
+def test_conectar_en_memoria_crea_los_datos_de_ejemplo():
+    conn = db.conectar({})
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT email FROM usuarios WHERE rol = 'admin'")
+        assert cursor.fetchone()['email'] == 'admin@biblioteca.com'
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def test_la_aplicacion_arranca_en_memoria(cliente):
+    inicio = time.perf_counter()
+    assert cliente.get('/healthz').status_code == 200
+    respuesta = cliente.get('/readyz')
+    assert respuesta.status_code == 200
+    assert respuesta.get_json()['listo'] is True
+    assert time.perf_counter() - inicio < 1.0
+
+
+def test_esquema_inexistente_es_un_error_de_base_de_datos(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, 'SQLITE_SCHEMA', str(tmp_path / 'no_existe.sql'))
+    with pytest.raises(db.ERRORES_BD, match='SQLITE_SCHEMA'):
+        db.conectar({'sqlite_path': str(tmp_path / 'nueva.db')})
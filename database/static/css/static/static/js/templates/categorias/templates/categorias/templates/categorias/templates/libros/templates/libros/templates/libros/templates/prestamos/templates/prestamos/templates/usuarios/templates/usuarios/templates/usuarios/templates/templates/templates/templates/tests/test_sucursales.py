@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Lecturas dispersas en varios nodos de sucursales"""
+
+import json
+import re
+
+import pytest
+from flask import g, session
+
+import app as aplicacion
+import perfilador
+import sucursales
+
+
+@pytest.fixture
+def dos_nodos(tmp_path):
+    """Mapa con dos nodos SQLite en archivos; al terminar se vuelve al nodo único"""
+    ruta = tmp_path / 'sucursales.json'
+    ruta.write_text(json.dumps({
+        'nodos': {
+            'principal': {'bloque': 0, 'sqlite_path': str(tmp_path / 'principal.db')},
+            'norte': {'bloque': 1, 'sqlite_path': str(tmp_path / 'norte.db')}
+        },
+        'sucursales': {
+            '1': {'nombre': 'Central', 'nodo': 'principal'},
+            '2': {'nombre': 'Norte', 'nodo': 'norte'}
+        }
+    }), encoding='utf-8')
+    sucursales.configurar_sucursales(aplicacion.DB_CONFIG, aplicacion.get_db_connection, str(ruta))
+    yield sucursales.listar_nodos()
+    sucursales.configurar_sucursales(aplicacion.DB_CONFIG, aplicacion.get_db_connection, None)
+
+
+def test_dispersar_combina_los_nodos(app, dos_nodos):
+    with app.test_request_context('/'):
+        resultados, fallidos = sucursales.dispersar(aplicacion.leer_filas(
+            "SELECT COUNT(*) as total FROM libros WHERE {filtro}", 'sucursal_id'
+        ))
+    assert fallidos == {}
+    assert len(resultados) == len(dos_nodos) == 2
+
+
+def test_perfil_incluye_las_consultas_de_todos_los_nodos(app, dos_nodos):
+    consulta = "SELECT COUNT(*) as total FROM libros WHERE {filtro}"
+    with app.test_request_context('/prestamos?perfilar=1'):
+        session['user_role'] = 'admin'
+        perfilador._iniciar()
+        try:
+            _, fallidos = sucursales.dispersar(aplicacion.leer_filas(consulta, 'sucursal_id'))
+            consultas = g.perfil['consultas']
+        finally:
+            g.pop('perfil')['muestreador'].detener()
+
+    assert fallidos == {}
+    registradas = [datos for texto, datos in consultas.items() if 'FROM libros WHERE sucursal_id IN' in texto]
+    assert sum(datos['veces'] for datos in registradas) == 2
+    assert sum(datos['filas'] for datos in registradas) == 2
+
+
+def test_listado_en_streaming_avisa_del_nodo_sin_conexion(admin, dos_nodos, en_streaming, monkeypatch):
+    conectar = aplicacion.get_db_connection
+
+    def sin_norte(nodo=None):
+        return None if nodo and nodo.nombre == 'norte' else conectar(nodo)
+    monkeypatch.setattr(aplicacion, 'get_db_connection', sin_norte)
+
+    respuesta = admin.get('/libros')
+    assert 'Content-Length' not in respuesta.headers
+    html = respuesta.get_data(as_text=True)
+    respuesta.close()
+    assert 'Datos incompletos, sin respuesta de: norte' in html
+
+
+@pytest.mark.parametrize('umbral', [aplicacion.UMBRAL_STREAMING, 0])
+def test_catalogo_intercala_los_nodos_con_la_colacion_de_la_bd(admin, dos_nodos, plantillas, monkeypatch, umbral):
+    # Colación sin distinguir mayúsculas, como utf8mb4_unicode_ci en MySQL
+    monkeypatch.setattr(aplicacion, 'CONSULTA_LIBROS', aplicacion.CONSULTA_LIBROS
+                        .replace('WEIGHT_STRING(l.titulo)', 'LOWER(l.titulo)')
+                        .replace('ORDER BY l.titulo', 'ORDER BY l.titulo COLLATE NOCASE'))
+    monkeypatch.setattr(aplicacion, 'UMBRAL_STREAMING', umbral)
+    aplicacion.cache_fragmentos.limpiar()
+
+    conn = aplicacion.get_db_connection(dos_nodos[1])
+    cursor = conn.cursor()
+    for titulo in ('abecedario ilustrado', 'zoología fantástica'):
+        cursor.execute(
+            "INSERT INTO libros (titulo, autor, categoria_id, cantidad_disponible, sucursal_id) VALUES (%s, %s, 1, 1, 2)",
+            (titulo, 'Anónimo')
+        )
+    conn.commit()
+    conn.close()
+
+    respuesta = admin.get('/libros')
+    tabla = respuesta.get_data(as_text=True).split('id="tablaLibros"')[1].split('</table>')[0]
+    titulos = re.findall(r'<strong>(.*?)</strong>', tabla)
+    respuesta.close()
+    aplicacion.cache_fragmentos.limpiar()
+
+    assert 'abecedario ilustrado' in titulos and 'zoología fantástica' in titulos
+    assert titulos == sorted(titulos, key=str.lower)
+
+
+def test_nodo_sin_responder_se_registra_en_el_log(app, dos_nodos, monkeypatch, caplog):
+    conectar = aplicacion.get_db_connection
+    monkeypatch.setattr(sucursales, '_conectar',
+                        lambda nodo: None if nodo.nombre == 'norte' else conectar(nodo))
+    with app.test_request_context('/'):
+        _, fallidos = sucursales.dispersar(aplicacion.leer_filas(
+            "SELECT COUNT(*) as total FROM libros WHERE {filtro}", 'sucursal_id'
+        ))
+    assert list(fallidos) == ['norte']
+    assert any(registro.name == 'sucursales' and registro.levelname == 'WARNING' and 'norte' in registro.getMessage()
+               for registro in caplog.records)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Transacciones con reintento para el Sistema de Gestión de Biblioteca
+
+Los préstamos y devoluciones actualizan a la vez `prestamos` y la fila
+compartida de `libros`. Con varios préstamos simultáneos del mismo título
+MySQL puede abortar la transacción por interbloqueo (1213) o por tiempo de
+espera de bloqueo (1205), y SQLite con "database is locked". Este módulo
+reintenta esas transacciones con una espera exponencial con jitter y lleva
+la cuenta de reintentos por ruta.
+
+Orden de bloqueo: toda transacción que toque ambas tablas debe bloquear
+primero la fila de `libros` (SELECT ... FOR UPDATE) y después `prestamos`.
+"""
+
+import random
+import threading
+import time
+from collections import defaultdict
+
+from db import ERRORES_BD, es_bloqueo
+
+# Errores de MySQL que indican que la transacción se puede repetir
+ER_LOCK_DEADLOCK = 1213
+ER_LOCK_WAIT_TIMEOUT = 1205
+ERRORES_REINTENTABLES = (ER_LOCK_DEADLOCK, ER_LOCK_WAIT_TIMEOUT)
+
+# Configuración de reintentos
+MAX_REINTENTOS = 4
+ESPERA_BASE = 0.05  # segundos
+ESPERA_MAXIMA = 1.0  # segundos
+
+_reintentos_por_ruta = defaultdict(int)
+_fallos_por_ruta = defaultdict(int)
+_metricas_lock = threading.Lock()
+
+
+def calcular_espera(intento):
+    """Espera exponencial con jitter completo para el intento indicado"""
+    limite = min(ESPERA_MAXIMA, ESPERA_BASE * (2 ** intento))
+    return random.uniform(0, limite)
+
+
+def es_reintentable(error):
+    """Indica si un error de MySQL o SQLite corresponde a un conflicto de bloqueos"""
+    return getattr(error, 'errno', None) in ERRORES_REINTENTABLES or es_bloqueo(error)
+
+
+def ejecutar_transaccion(conn, operacion, ruta, max_reintentos=MAX_REINTENTOS):
+    """
+    Ejecutar `operacion(cursor)` dentro de una transacción con reintentos.
+
+    La operación debe ser idempotente respecto a la transacción: en cada
+    intento fallido se hace ROLLBACK y se vuelve a ejecutar desde el
+    principio. Devuelve el valor retornado por la operación. Los errores que
+    no son de bloqueo, o los que agotan los reintentos, se propagan.
+    """
+    intento = 0
+    while True:
+        cursor = conn.cursor()
+        try:
+            resultado = operacion(cursor)
+            conn.commit()
+            return resultado
+        except ERRORES_BD as e:
+            conn.rollback()
+            if not es_reintentable(e):
+                raise
+            if intento >= max_reintentos:
+                _registrar(_fallos_por_ruta, ruta)
+                raise
+            intento += 1
+            _registrar(_reintentos_por_ruta, ruta)
+            time.sleep(calcular_espera(intento))
+        finally:
+            cursor.close()
+
+
+def _registrar(contador, ruta):
+    """Incrementar un contador de métricas de forma segura entre hilos"""
+    with _metricas_lock:
+        contador[ruta] += 1
+
+
+def obtener_metricas_reintentos():
+    """Retorna una copia de los reintentos y fallos acumulados por ruta"""
+    with _metricas_lock:
+        return {
+            'reintentos': dict(_reintentos_por_ruta),
+            'fallos': dict(_fallos_por_ruta)
+        }
@@ -10,7 +10,7 @@ Este script verifica que todos los componentes del sistema estén funcionando co
 
 import os
 import sys
-import mysql.connector
+from db import ERRORES_BD
 from datetime import datetime
 
 def print_header(title):
@@ -118,45 +118,39 @@ def check_database_connection():
     print_header("VERIFICACIÓN DE BASE DE DATOS")
     
     try:
-        # Importar configuración desde app.py
+        # Usar la misma conexión que la aplicación (MySQL o SQLite)
         sys.path.append('.')
-        from app import DB_CONFIG
+        from app import get_db_connection
+        from db import BACKEND, estimar_filas
         
-        # Intentar conexión
-        connection = mysql.connector.connect(**DB_CONFIG)
+        connection = get_db_connection()
         
-        if connection.is_connected():
-            cursor = connection.cursor()
-            
-            # Verificar que la base de datos existe
-            cursor.execute("SELECT DATABASE()")
-            db_name = cursor.fetchone()[0]
-            print_check(f"Conexión a MySQL", True, f"Base de datos: {db_name}")
+        if connection and connection.is_connected():
+            print_check("Conexión a la base de datos", True, f"Motor: {BACKEND}")
             
-            # Verificar tablas requeridas
+            # Verificar tablas requeridas con filas estimadas (sin recorrerlas con COUNT(*))
             required_tables = ['usuarios', 'categorias', 'libros', 'prestamos']
-            cursor.execute("SHOW TABLES")
-            existing_tables = [table[0] for table in cursor.fetchall()]
+            estimated_rows = estimar_filas(connection)
             
             for table in required_tables:
-                exists = table in existing_tables
+                exists = table in estimated_rows
                 print_check(f"Tabla: {table}", exists)
                 
                 if exists:
-                    # Contar registros
-                    cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                    count = cursor.fetchone()[0]
-                    print_check(f"  Registros en {table}", count > 0, f"{count} registros")
+                    count = estimated_rows[table] or 0
+                    print_check(f"  Registros en {table}", count > 0, f"~{count} registros (estimado)")
             
-            cursor.close()
             connection.close()
             return True
+        
+        print_check("Conexión a la base de datos", False, "No se pudo conectar")
+        return False
             
-    except mysql.connector.Error as e:
-        print_check("Conexión a MySQL", False, f"Error: {e}")
+    except ERRORES_BD as e:
+        print_check("Conexión a la base de datos", False, f"Error: {e}")
         return False
     except Exception as e:
-        print_check("Conexión a MySQL", False, f"Error inesperado: {e}")
+        print_check("Conexión a la base de datos", False, f"Error inesperado: {e}")
         return False
 
 def check_app_configuration():
@@ -196,23 +190,21 @@ def test_basic_functionality():
         cursor = conn.cursor(dictionary=True)
         
         # Probar consulta de usuarios
-        cursor.execute("SELECT COUNT(*) as count FROM usuarios")
-        users_count = cursor.fetchone()['count']
-        print_check(f"Usuarios en sistema", users_count > 0, f"{users_count} usuarios")
+        cursor.execute("SELECT id FROM usuarios LIMIT 1")
+        print_check("Usuarios en sistema", bool(cursor.fetchall()))
         
         # Probar consulta de libros
-        cursor.execute("SELECT COUNT(*) as count FROM libros")
-        books_count = cursor.fetchone()['count']
-        print_check(f"Libros en catálogo", books_count > 0, f"{books_count} libros")
+        cursor.execute("SELECT id FROM libros LIMIT 1")
+        print_check("Libros en catálogo", bool(cursor.fetchall()))
         
         # Probar consulta con JOIN
         cursor.execute("""
-            SELECT COUNT(*) as count 
+            SELECT l.id
             FROM libros l 
             JOIN categorias c ON l.categoria_id = c.id
+            LIMIT 1
         """)
-        join_count = cursor.fetchone()['count']
-        print_check("Relaciones entre tablas", join_count > 0, "JOINs funcionando")
+        print_check("Relaciones entre tablas", bool(cursor.fetchall()), "JOINs funcionando")
         
         cursor.close()
         conn.close()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Versiones de tablas y GET condicional para el Sistema de Gestión de Biblioteca
+
+Cada tabla tiene un contador de versión en memoria que las rutas de
+creación, edición y eliminación incrementan tras un COMMIT exitoso. Las
+páginas de listado calculan su ETag/Last-Modified a partir de esas
+versiones y responden `304 Not Modified` sin consultar MySQL ni renderizar
+Jinja cuando el cliente ya tiene la versión actual.
+
+Nota: los contadores viven en el proceso. Con un solo proceso (run.py) son
+exactos; si se despliega con varios procesos, cada uno debe recibir las
+invalidaciones o se deben desactivar estas cabeceras.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+from flask import g, make_response, request, session
+
+# Identificador del arranque: invalida los ETag emitidos por procesos anteriores
+_ARRANQUE = format(int(time.time() * 1000), 'x')
+
+_versiones = {}
+_lock = threading.Lock()
+
+
+def _ahora():
+    """Fecha y hora actual en UTC"""
+    return datetime.now(timezone.utc)
+
+
+_INICIO = _ahora()
+
+
+def incrementar_version(*tablas):
+    """Marcar tablas como modificadas (llamar después del COMMIT)"""
+    momento = _ahora()
+    with _lock:
+        for tabla in tablas:
+            contador, _ = _versiones.get(tabla, (0, _INICIO))
+            _versiones[tabla] = (contador + 1, momento)
+
+
+def obtener_version(tabla):
+    """Retorna la tupla (contador, ultima_modificacion) de una tabla"""
+    with _lock:
+        return _versiones.get(tabla, (0, _INICIO))
+
+
+def calcular_etag(tablas, *extra):
+    """ETag débil a partir de las versiones de las tablas y datos adicionales"""
+    partes = [_ARRANQUE]
+    partes.extend(f"{tabla}.{obtener_version(tabla)[0]}" for tabla in tablas)
+    partes.extend(str(valor) for valor in extra)
+    return '-'.join(partes)
+
+
+def ultima_modificacion(tablas):
+    """Fecha de la última modificación entre las tablas indicadas"""
+    return max(obtener_version(tabla)[1] for tabla in tablas)
+
+
+def _no_modificado(etag, modificado):
+    """Evaluar If-None-Match / If-Modified-Since de la petición actual"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since:
+        # Last-Modified tiene resolución de segundos: si hubo cambios en el
+        # segundo actual no se puede garantizar que el cliente los tenga
+        if _ahora() - modificado < timedelta(seconds=1):
+            return False
+        return modificado.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def condicional(*tablas):
+    """
+    Decorador para listados que dependen solo de `tablas`.
+
+    El ETag incluye el usuario de la sesión porque la plantilla base muestra
+    su nombre y rol. Si hay mensajes flash pendientes se renderiza siempre
+    para no ocultarlos, y si la conexión a MySQL falló (`g.db_error`) la
+    respuesta se envía sin validadores.
+    """
+    def decorador(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return f(*args, **kwargs)
+
+            etag = calcular_etag(tablas, session.get('user_id'), session.get('user_role'),
+                                 request.query_string.decode('latin-1'))
+            modificado = ultima_modificacion(tablas)
+
+            if '_flashes' not in session and _no_modificado(etag, modificado):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                # No cachear listados incompletos por fallos de conexión
+                if response.status_code != 200 or g.get('db_error'):
+                    return response
+
+            response.set_etag(etag, weak=True)
+            response.last_modified = modificado
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
+        return decorated_function
+    return decorador